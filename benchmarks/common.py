@@ -0,0 +1,75 @@
+import os
+import json
+import time
+import socket
+import platform
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+
+def machine_metadata() -> Dict[str, object]:
+    """What a result was measured on, numbers from different machines are not comparable."""
+    info = {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+    }
+
+    try:
+        import numpy
+        info["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+
+    try:
+        info["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                            cwd=str(Path(__file__).parent), timeout=5).stdout.strip() or None
+    except Exception:
+        info["git_commit"] = None
+
+    return info
+
+
+def summarize(samples:List[float]) -> Dict[str, float]:
+    """Seconds, the median is what compare looks at."""
+    ordered = sorted(samples)
+    return {
+        "calls": len(ordered),
+        "median_s": statistics.median(ordered),
+        "mean_s": statistics.fmean(ordered),
+        "min_s": ordered[0],
+        "p90_s": ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))],
+        "max_s": ordered[-1],
+    }
+
+
+def write_results(path:str, kind:str, config:dict, results:list):
+    report = {
+        "kind": kind,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": machine_metadata(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as fp:
+        json.dump(report, fp, indent=2)
+    print("results written to: '{}'".format(path))
+
+
+def parse_int_list(text:str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def format_seconds(seconds:float) -> str:
+    if seconds < 1e-3:
+        return "{:.1f} us".format(seconds * 1e6)
+    if seconds < 1.0:
+        return "{:.2f} ms".format(seconds * 1e3)
+    return "{:.2f} s".format(seconds)
+
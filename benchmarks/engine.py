@@ -0,0 +1,205 @@
+"""Engine benchmarks: the AuctionHouse round phases and the leaderboard state, across agent and round counts.
+
+    python -m benchmarks.engine run --agents 10,100,1000,10000 --rounds 10,100 --out bench.json
+    python -m benchmarks.engine compare baseline.json bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+from typing import Dict, List
+
+from benchmarks.common import write_results, summarize, parse_int_list, format_seconds
+
+
+CASES = [
+    "_generate_auctions",
+    "register_bid",
+    "process_pool_buys",
+    "process_all_bids",
+    "prepare_auctions_and_pool",
+    "_compute_leadboard_state",
+]
+
+
+def _quiet():
+    # the engine prints on construction, on joins and on errors, keep that out of the output
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _make_house(n_agents:int, n_rounds:int, seed:int):
+    from dnd_auction_game.auction_house import AuctionHouse
+
+    with _quiet():
+        house = AuctionHouse(game_token="bench", play_token="bench", save_logs=False, seed=seed)
+        # add_agent always appends to the player id log
+        house.log_player_id_file = os.devnull
+        for i in range(n_agents):
+            house.add_agent("bench_{}".format(i), "agent_{}".format(i), "bench")
+        house.start_game(n_rounds + 1)
+    return house
+
+
+def _random_bids(house, rng:random.Random):
+    """A plausible round of bids: each agent bids on a couple of auctions, now and then buys from the pool."""
+    auction_ids = list(house.current_auctions)
+    bids = []
+    pool_buys = []
+    for a_id, agent in house.agents.items():
+        gold = agent["gold"]
+        if auction_ids and gold > 0:
+            for auction_id in rng.sample(auction_ids, min(2, len(auction_ids))):
+                bids.append((a_id, auction_id, rng.randint(1, max(1, gold // 4))))
+        if agent["points"] > 0 and rng.random() < 0.05:
+            pool_buys.append((a_id, rng.randint(1, agent["points"])))
+    return bids, pool_buys
+
+
+def run_case(n_agents:int, n_rounds:int, seed:int) -> Dict[str, List[float]]:
+    """Plays one game and returns the seconds per call of every case, one sample per round."""
+    with _quiet():
+        from dnd_auction_game import server
+
+    rng = random.Random(seed)
+    house = _make_house(n_agents, n_rounds, seed)
+    server.auction_house = house
+
+    samples = {case: [] for case in CASES}
+    clock = time.perf_counter
+
+    with _quiet():
+        house.prepare_auctions_and_pool()
+
+        for _ in range(n_rounds):
+            bids, pool_buys = _random_bids(house, rng)
+
+            t = clock()
+            for a_id, points in pool_buys:
+                house.register_pool_buy(a_id, points)
+            for a_id, auction_id, gold in bids:
+                house.register_bid(a_id, auction_id, gold)
+            if bids:
+                samples["register_bid"].append((clock() - t) / len(bids))
+
+            t = clock()
+            house.process_pool_buys()
+            samples["process_pool_buys"].append(clock() - t)
+
+            t = clock()
+            house.process_all_bids()
+            samples["process_all_bids"].append(clock() - t)
+
+            t = clock()
+            house.prepare_auctions_and_pool()
+            samples["prepare_auctions_and_pool"].append(clock() - t)
+
+            # generated on the side, the round's auctions are the ones prepare made
+            t = clock()
+            house._generate_auctions()
+            samples["_generate_auctions"].append(clock() - t)
+
+            t = clock()
+            server._compute_leadboard_state()
+            samples["_compute_leadboard_state"].append(clock() - t)
+
+    return samples
+
+
+def cmd_run(args):
+    agents = parse_int_list(args.agents)
+    rounds = parse_int_list(args.rounds)
+
+    results = []
+    for n_rounds in rounds:
+        for n_agents in agents:
+            t = time.perf_counter()
+            # the same game played `repeat` times, short games give few samples per case otherwise
+            samples = {case: [] for case in CASES}
+            for _ in range(max(1, args.repeat)):
+                for case, values in run_case(n_agents, n_rounds, args.seed).items():
+                    samples[case].extend(values)
+            print("agents={:<6} rounds={:<6} ({:.1f} s)".format(n_agents, n_rounds, time.perf_counter() - t))
+
+            for case in CASES:
+                if not samples[case]:
+                    continue
+                summary = summarize(samples[case])
+                print("    {:<28} median {:>10}  p90 {:>10}".format(case, format_seconds(summary["median_s"]),
+                                                                      format_seconds(summary["p90_s"])))
+                result = {"case": case, "agents": n_agents, "rounds": n_rounds}
+                result.update(summary)
+                results.append(result)
+
+    config = {"agents": agents, "rounds": rounds, "seed": args.seed, "repeat": args.repeat}
+    write_results(args.out, "engine", config, results)
+
+
+def _load(path:str) -> dict:
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def compare(baseline:dict, current:dict, threshold:float) -> List[dict]:
+    """Median of every case in both files, a ratio above 1 + threshold is a regression."""
+    base = {(r["case"], r["agents"], r["rounds"]): r for r in baseline["results"]}
+
+    rows = []
+    for r in current["results"]:
+        b = base.get((r["case"], r["agents"], r["rounds"]))
+        if b is None or b["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        status = "ok"
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        rows.append({"case": r["case"], "agents": r["agents"], "rounds": r["rounds"],
+                     "baseline_s": b["median_s"], "current_s": r["median_s"], "ratio": ratio, "status": status})
+    return rows
+
+
+def cmd_compare(args):
+    baseline = _load(args.baseline)
+    current = _load(args.current)
+
+    for key in ("cpu_count", "processor", "python", "numpy"):
+        if baseline["machine"].get(key) != current["machine"].get(key):
+            print("<WARNING: {} differs: {} vs {}>".format(key, baseline["machine"].get(key), current["machine"].get(key)))
+
+    rows = compare(baseline, current, args.threshold)
+    for row in rows:
+        print("{:<28} agents={:<6} rounds={:<6} {:>10} -> {:>10}  x{:.2f}  {}".format(
+            row["case"], row["agents"], row["rounds"], format_seconds(row["baseline_s"]),
+            format_seconds(row["current_s"]), row["ratio"], row["status"]))
+
+    regressions = [row for row in rows if row["status"] == "REGRESSION"]
+    print("{} cases compared, {} regressions (threshold {:.0%})".format(len(rows), len(regressions), args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the auction engine.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="time the engine and write the results as JSON")
+    run_parser.add_argument("--agents", default="10,100,1000,10000", help="comma separated agent counts")
+    run_parser.add_argument("--rounds", default="10,100", help="comma separated round counts")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--repeat", type=int, default=3, help="play every game this many times")
+    run_parser.add_argument("--out", default="bench_engine.json")
+
+    compare_parser = sub.add_parser("compare", help="flag regressions of a run against a saved baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        cmd_run(args)
+    else:
+        sys.exit(cmd_compare(args))
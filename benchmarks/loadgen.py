@@ -0,0 +1,399 @@
+"""Websocket load generator: thousands of synthetic agents against a running server.
+
+    uvicorn dnd_auction_game.server:app
+    python -m benchmarks.loadgen --agents 2000 --processes 4 --rounds 20 --tick 1.0 --think exp:0.05 --bids random
+
+The agents connect to /ws/{token} with the same handshake as AuctionGameClient, the game is
+started over /ws_run once the server lists all of them as players, and every round each agent waits a think time
+and answers with a bid pattern. The result is a capacity report for the tick interval the server
+runs with (AH_TICK_INTERVAL), also written as JSON.
+"""
+import io
+import re
+import sys
+import math
+import json
+import time
+import random
+import asyncio
+import socket
+import argparse
+import contextlib
+import multiprocessing
+import http.client
+import urllib.request
+from typing import Dict, List
+
+from benchmarks.common import write_results, format_seconds
+
+
+def parse_think_time(spec:str):
+    """const:S, uniform:A:B, exp:MEAN or lognorm:MEDIAN:SIGMA (seconds), returns a function of an rng."""
+    name, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+
+    if name == "const":
+        return lambda rng: values[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "exp":
+        return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    if name == "lognorm":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+
+    raise ValueError("Unknown think time distribution: '{}'".format(spec))
+
+
+def make_bids(pattern:str, round_data:dict, a_id:str, rng:random.Random) -> dict:
+    """none: empty answer, tiny: 1 gold on one auction, random: a few random bids, all: a bid on every auction."""
+    if pattern == "none":
+        return {}
+
+    auctions = list(round_data.get("auctions", {}))
+    gold = round_data.get("states", {}).get(a_id, {}).get("gold", 0)
+    if not auctions or gold < 1:
+        return {}
+
+    if pattern == "tiny":
+        return {"bids": {rng.choice(auctions): 1}}
+    if pattern == "random":
+        picked = rng.sample(auctions, min(3, len(auctions)))
+        return {"bids": {auction_id: rng.randint(1, max(1, gold // 4)) for auction_id in picked}}
+    if pattern == "all":
+        share = max(1, gold // (2 * len(auctions)))
+        return {"bids": {auction_id: share for auction_id in auctions}}
+
+    raise ValueError("Unknown bid pattern: '{}'".format(pattern))
+
+
+class _WorkerStats:
+    def __init__(self):
+        self.rounds: Dict[int, List[float]] = {}   # round -> [first recv, last recv, agents that got it]
+        self.response_times: List[float] = []     # recv -> bid sent, think time included
+        self.think_times: List[float] = []
+        self.opened = 0       # handshake sent, the join may still be in flight on the server
+        self.connected = 0    # got a round from the server
+        self.failed = 0
+        self.dropped = 0
+        self.rounds_per_agent: List[int] = []
+
+    def round_received(self, round_no:int, t:float):
+        entry = self.rounds.get(round_no)
+        if entry is None:
+            self.rounds[round_no] = [t, t, 1]
+        else:
+            entry[0] = min(entry[0], t)
+            entry[1] = max(entry[1], t)
+            entry[2] += 1
+
+
+async def _agent(args, index:int, think, stats:_WorkerStats, connect_slots:asyncio.Semaphore):
+    from websockets.exceptions import ConnectionClosedOK
+    from dnd_auction_game.client import connect_to_server
+
+    rng = random.Random(args.seed * 1000003 + index)
+    a_id = "load_agent_{}".format(index)
+    agent_info = {"name": "load_{}".format(index), "a_id": a_id, "player_id": "loadgen"}
+
+    transport = "unix" if args.unix_socket else "tcp"
+    n_rounds = 0
+    try:
+        async with connect_slots:
+            sock = await connect_to_server(args.host, args.port, "/ws/{}".format(args.token), transport, args.unix_socket)
+            await sock.send(json.dumps(agent_info))
+        stats.opened += 1
+    except Exception:
+        stats.failed += 1
+        return
+
+    last_round = False
+    try:
+        while True:
+            round_data_raw = await sock.recv()
+            t_received = time.time()
+            round_data = json.loads(round_data_raw)
+            stats.round_received(round_data.get("round", -1), t_received)
+            if n_rounds == 0:
+                stats.connected += 1
+            n_rounds += 1
+            # the schedules run to the end of the game, the last round has one entry left
+            last_round = len(round_data.get("remainder_gold_income", ())) <= 1
+
+            think_time = think(rng)
+            stats.think_times.append(think_time)
+            if think_time > 0:
+                await asyncio.sleep(think_time)
+
+            message = make_bids(args.bids, round_data, a_id, rng)
+            message["round"] = round_data.get("round")
+            await sock.send(json.dumps(message))
+            stats.response_times.append(time.time() - t_received)
+
+    except ConnectionClosedOK:
+        # a clean close is only the end of the game after its last round
+        if not last_round:
+            stats.dropped += 1
+    except Exception:
+        stats.dropped += 1
+    finally:
+        stats.rounds_per_agent.append(n_rounds)
+        try:
+            await sock.close()
+        except Exception:
+            pass
+
+
+async def _run_worker(args, indices:List[int], ready_queue) -> _WorkerStats:
+    stats = _WorkerStats()
+    think = parse_think_time(args.think)
+    connect_slots = asyncio.Semaphore(args.connect_concurrency)
+
+    tasks = [asyncio.create_task(_agent(args, index, think, stats, connect_slots)) for index in indices]
+
+    # report once every agent of this worker sent its handshake or failed to
+    while stats.opened + stats.failed < len(indices):
+        await asyncio.sleep(0.05)
+    ready_queue.put((stats.opened, stats.failed))
+
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def _worker_main(args, indices:List[int], ready_queue, result_queue):
+    # connect_to_server prints a line per connection
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = asyncio.run(_run_worker(args, indices, ready_queue))
+    result_queue.put({
+        "rounds": stats.rounds,
+        "response_times": stats.response_times,
+        "think_times": stats.think_times,
+        "opened": stats.opened,
+        "connected": stats.connected,
+        "failed": stats.failed,
+        "dropped": stats.dropped,
+        "rounds_per_agent": stats.rounds_per_agent,
+    })
+
+
+def _percentiles(values:List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": ordered[-1]}
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path:str, timeout:float):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def _fetch(args, path:str, quiet:bool=False):
+    try:
+        if args.unix_socket:
+            connection = _UnixHTTPConnection(args.unix_socket, timeout=5)
+            try:
+                connection.request("GET", path)
+                return connection.getresponse().read().decode("utf-8")
+            finally:
+                connection.close()
+
+        with urllib.request.urlopen("http://{}:{}{}".format(args.host, args.port, path), timeout=5) as response:
+            return response.read().decode("utf-8")
+    except Exception as e:
+        if not quiet:
+            print("<WARNING: could not fetch {}: {}>".format(path, e))
+        return None
+
+
+def _wait_for_joins(args, expected:int, timeout:float=30.0) -> int:
+    """Waits until the server lists `expected` load agents as players, returns how many it lists."""
+    joined = 0
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        text = _fetch(args, "/api/leadboard?limit=0&filter=load_", quiet=True)
+        if text:
+            joined = json.loads(text).get("total_players", 0)
+            if joined >= expected:
+                break
+        time.sleep(0.1)
+    return joined
+
+
+def _tick_phase_totals(text:str) -> Dict[str, List[float]]:
+    """phase -> [sum, count] of the server's tick phase histogram in /metrics."""
+    totals = {}
+    for line in (text or "").splitlines():
+        match = re.match(r'ah_tick_phase_seconds_(sum|count)\{phase="([^"]+)"\} (\S+)', line)
+        if match:
+            kind, phase, value = match.groups()
+            totals.setdefault(phase, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return totals
+
+
+def _tick_work(before:Dict[str, List[float]], after:Dict[str, List[float]]) -> Dict[str, float]:
+    """Mean seconds per tick phase during the run (the metrics count from the server start)."""
+    work = {}
+    for phase, (total, count) in after.items():
+        prev_total, prev_count = before.get(phase, (0.0, 0.0))
+        if count > prev_count:
+            work[phase] = (total - prev_total) / (count - prev_count)
+    return work
+
+
+async def _start_game(args):
+    from dnd_auction_game.play import AuctionGameRunner
+    runner = AuctionGameRunner(args.host, play_token=args.play_token, n_rounds=args.rounds, port=args.port,
+                               unix_socket=args.unix_socket)
+    await runner._internal_run()
+
+
+def build_report(args, results:List[dict], server_latency, tick_work, elapsed:float) -> dict:
+    rounds = {}
+    for result in results:
+        for round_no, (first, last, count) in result["rounds"].items():
+            entry = rounds.setdefault(round_no, [first, last, 0])
+            entry[0] = min(entry[0], first)
+            entry[1] = max(entry[1], last)
+            entry[2] += count
+
+    ordered = sorted(rounds)
+    spreads = [rounds[r][1] - rounds[r][0] for r in ordered]
+    # the time between the first agent seeing round r and round r + 1: the effective tick
+    intervals = [rounds[b][0] - rounds[a][0] for a, b in zip(ordered, ordered[1:])]
+    overruns = [max(0.0, interval - args.tick) for interval in intervals]
+
+    connected = sum(r["connected"] for r in results)
+    response_times = [t for r in results for t in r["response_times"]]
+    think_times = [t for r in results for t in r["think_times"]]
+    rounds_per_agent = [n for r in results for n in r["rounds_per_agent"]]
+
+    report = {
+        "tick_interval": args.tick,
+        "agents_requested": args.agents,
+        "agents_connected": connected,
+        "connect_failed": sum(r["failed"] for r in results),
+        "dropped": sum(r["dropped"] for r in results),
+        "rounds_seen": len(ordered),
+        "min_rounds_per_agent": min(rounds_per_agent) if rounds_per_agent else 0,
+        "incomplete_rounds": sum(1 for r in ordered if rounds[r][2] < connected),
+        "fanout_spread_s": _percentiles(spreads),
+        "round_interval_s": _percentiles(intervals),
+        "tick_overrun_s": _percentiles(overruns),
+        "client_response_s": _percentiles(response_times),
+        "think_s": _percentiles(think_times),
+        "server_tick_work_s": tick_work,
+        "elapsed_s": elapsed,
+    }
+
+    if server_latency is not None:
+        report["server_bid_latency_ms"] = {"p50": server_latency.get("p50_ms"), "p99": server_latency.get("p99_ms")}
+        report["server_missed_rounds"] = sum(a["missed"] for a_id, a in server_latency.get("agents", {}).items()
+                                             if a_id.startswith("load_agent_"))
+        report["server_recommended_tick"] = server_latency.get("recommended_tick")
+
+    overrun_p99 = report["tick_overrun_s"]["p99"] or 0.0
+    report["fits"] = (report["connect_failed"] == 0 and report["dropped"] == 0 and report["incomplete_rounds"] == 0
+                      and report.get("server_missed_rounds", 0) == 0 and overrun_p99 < 0.1 * args.tick)
+    return report
+
+
+def print_report(report:dict):
+    fmt = lambda v: "-" if v is None else format_seconds(v)
+    line = lambda name, p: print("{:<24} p50 {:>10}  p99 {:>10}  max {:>10}".format(name, fmt(p["p50"]), fmt(p["p99"]), fmt(p["max"])))
+
+    print("")
+    print("capacity report, tick interval {} s".format(report["tick_interval"]))
+    print("agents                   {} connected of {}, {} failed to connect, {} dropped".format(
+        report["agents_connected"], report["agents_requested"], report["connect_failed"], report["dropped"]))
+    print("rounds                   {} seen, every agent got at least {}, {} rounds not seen by every agent".format(
+        report["rounds_seen"], report["min_rounds_per_agent"], report["incomplete_rounds"]))
+    line("broadcast fan-out", report["fanout_spread_s"])
+    line("round interval", report["round_interval_s"])
+    line("tick overrun", report["tick_overrun_s"])
+    line("client think time", report["think_s"])
+    line("client response", report["client_response_s"])
+    if report["server_tick_work_s"]:
+        print("server tick work         " + ", ".join("{} {}".format(phase, format_seconds(v))
+                                                       for phase, v in sorted(report["server_tick_work_s"].items())))
+    if "server_bid_latency_ms" in report:
+        print("server bid latency       p50 {} ms  p99 {} ms, {} missed rounds, recommended tick {} s".format(
+            report["server_bid_latency_ms"]["p50"], report["server_bid_latency_ms"]["p99"],
+            report["server_missed_rounds"], report["server_recommended_tick"]))
+    print("verdict                  {}".format("fits the tick" if report["fits"] else "DOES NOT fit the tick"))
+
+
+def main(args):
+    n_processes = max(1, min(args.processes, args.agents))
+    shards = [list(range(p, args.agents, n_processes)) for p in range(n_processes)]
+
+    ready_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker_main, args=(args, shard, ready_queue, result_queue), daemon=True)
+               for shard in shards]
+    for worker in workers:
+        worker.start()
+
+    opened = 0
+    for _ in workers:
+        ok, _failed = ready_queue.get()
+        opened += ok
+    if opened == 0:
+        print("<ERROR: no agent could connect to the server>")
+        return 1
+
+    # the handshakes are sent, the game only starts once the server has added every agent
+    joined = _wait_for_joins(args, opened)
+    print("<{} of {} agents connected, {} joined the game>".format(opened, args.agents, joined))
+    if joined < opened:
+        print("<WARNING: {} agents did not join in time>".format(opened - joined))
+
+    metrics_before = _tick_phase_totals(_fetch(args, "/metrics"))
+
+    t_start = time.time()
+    if args.start:
+        asyncio.run(_start_game(args))
+
+    results = [result_queue.get() for _ in workers]
+    elapsed = time.time() - t_start
+    for worker in workers:
+        worker.join(timeout=5)
+
+    latency_text = _fetch(args, "/api/latency")
+    server_latency = json.loads(latency_text) if latency_text else None
+    tick_work = _tick_work(metrics_before, _tick_phase_totals(_fetch(args, "/metrics")))
+
+    report = build_report(args, results, server_latency, tick_work, elapsed)
+    print_report(report)
+
+    config = {key: value for key, value in vars(args).items() if key != "out"}
+    write_results(args.out, "loadgen", config, [report])
+    return 0 if report["fits"] else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a game server with synthetic agents and report its capacity.")
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=max(1, multiprocessing.cpu_count() - 1),
+                        help="client processes the agents are spread over")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", default=None, help="connect over this Unix domain socket instead of TCP")
+    parser.add_argument("--token", default="play123", help="game token")
+    parser.add_argument("--play-token", default="play123", help="token to start the game with")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--no-start", dest="start", action="store_false",
+                        help="don't start the game, wait for someone else to (e.g. dnd_auction_game.play)")
+    parser.add_argument("--tick", type=float, default=1.0, help="the server's AH_TICK_INTERVAL, the report is against it")
+    parser.add_argument("--think", default="exp:0.05", help="think time: const:S, uniform:A:B, exp:MEAN, lognorm:MEDIAN:SIGMA")
+    parser.add_argument("--bids", default="random", choices=["none", "tiny", "random", "all"])
+    parser.add_argument("--connect-concurrency", type=int, default=200, help="handshakes in flight per process")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_loadgen.json")
+    sys.exit(main(parser.parse_args()))
@@ -5,9 +5,15 @@ from collections import defaultdict
 import json
 import math
 import os
+import time
+import hashlib
 
+from dnd_auction_game.rank_index import RankIndex
+from dnd_auction_game.history import PointsHistory, SeriesStore
+from dnd_auction_game.tracing import tracer
 
-def generate_gold_random_walk(n_steps:int) -> List[float]:
+
+def generate_gold_random_walk(n_steps:int, rng=random) -> List[float]:
 
     gold_per_round = 1000
     step_size = 150
@@ -15,7 +21,7 @@ def generate_gold_random_walk(n_steps:int) -> List[float]:
 
     gold = [gold_per_round]
     for i in range(n_steps-1):
-        next_gold = gold[-1] + random.randint(-step_size, step_size) - 1
+        next_gold = gold[-1] + rng.randint(-step_size, step_size) - 1
 
         if next_gold < 10:
             next_gold = 10
@@ -26,11 +32,11 @@ def generate_gold_random_walk(n_steps:int) -> List[float]:
         gold.append(next_gold)
 
         if i % 500 == 0:
-            gold[-1] = gold_per_round + random.randint(-step_size // 2, step_size)
+            gold[-1] = gold_per_round + rng.randint(-step_size // 2, step_size)
 
     return gold
 
-def braavos_bank_limit_random_walk(n_steps:int) -> List[int]:
+def braavos_bank_limit_random_walk(n_steps:int, rng=random) -> List[int]:
 
     upper_limit_start = 5000
     upper_limit_end = 20000
@@ -38,7 +44,7 @@ def braavos_bank_limit_random_walk(n_steps:int) -> List[int]:
 
     upper_limits = [upper_limit_start]
     for i in range(n_steps-1):
-        next_limit = upper_limits[-1] + random.randint(-step_size, step_size)
+        next_limit = upper_limits[-1] + rng.randint(-step_size, step_size)
 
         if next_limit < 50:
             next_limit = 50
@@ -53,7 +59,7 @@ def braavos_bank_limit_random_walk(n_steps:int) -> List[int]:
 
     return upper_limits
 
-def braavos_bank_interest_rate_random_walk(n_steps:int) -> List[float]:
+def braavos_bank_interest_rate_random_walk(n_steps:int, rng=random) -> List[float]:
 
     start_rate = 1.00
     min_rate = 1.0
@@ -62,7 +68,7 @@ def braavos_bank_interest_rate_random_walk(n_steps:int) -> List[float]:
 
     rates = [start_rate]
     for i in range(n_steps-1):
-        next_rate = rates[-1] + random.uniform(-step_size, step_size)
+        next_rate = rates[-1] + rng.uniform(-step_size, step_size)
 
         if next_rate < min_rate:
             next_rate = min_rate
@@ -73,7 +79,7 @@ def braavos_bank_interest_rate_random_walk(n_steps:int) -> List[float]:
         rates.append(next_rate)
 
         if i % 250 == 0:
-            rates[-1] = start_rate + random.uniform(-step_size, step_size)
+            rates[-1] = start_rate + rng.uniform(-step_size, step_size)
 
 
     return rates
@@ -82,9 +88,15 @@ def braavos_bank_interest_rate_random_walk(n_steps:int) -> List[float]:
 
 
 class AuctionHouse:
-    def __init__(self, game_token:str, play_token:str, save_logs=False):
+    def __init__(self, game_token:str, play_token:str, save_logs=False, seed:int=None):
         self.is_done = False
         self.is_active = False
+
+        # every random draw of a game comes from this generator, a seed and the bids replay the game
+        self.seed = random.randrange(2**63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # set by persistence.StateStore, which journals joins, the start, accepted bids, pool buys and rounds
+        self.journal = None
         
         self.log_player_id_file = None
         self.log_file = None
@@ -98,8 +110,13 @@ class AuctionHouse:
         
         self.agents = {}
         self.names = {}
-        self.points_gain_history = {}
-        self._prev_points = {}
+        self.points_history = PointsHistory(window=100)
+        self.series = SeriesStore()
+
+        # leaderboard order, only agents whose points changed are moved when a round settles
+        self.rank_index = RankIndex()
+        self.rank_movers = {}
+        self._points_changed = set()
         
         self.bank_interest_rate = 1.1
         self.auctions_per_agent = 1.5
@@ -151,18 +168,31 @@ class AuctionHouse:
     def set_num_rounds(self, num_rounds:int):
         self.num_rounds_in_game = num_rounds
 
-        self.gold_income_per_round = generate_gold_random_walk(num_rounds)
-        self.bank_limit_per_round = braavos_bank_limit_random_walk(num_rounds)
-        self.bank_interest_per_round = braavos_bank_interest_rate_random_walk(num_rounds)
+        self.gold_income_per_round = generate_gold_random_walk(num_rounds, self.rng)
+        self.bank_limit_per_round = braavos_bank_limit_random_walk(num_rounds, self.rng)
+        self.bank_interest_per_round = braavos_bank_interest_rate_random_walk(num_rounds, self.rng)
+
+    def start_game(self, num_rounds:int):
+        self.set_num_rounds(max(1, int(num_rounds)))
+        self.assign_priorities()
+        self.is_active = True
+
+        if self.journal is not None:
+            self.journal.write({"t": "start", "num_rounds": self.num_rounds_in_game})
 
 
-    def reset(self):
+    def reset(self, seed:int=None):
         self.is_done = False
         self.is_active = False
+        self.seed = random.randrange(2**63) if seed is None else seed
+        self.rng = random.Random(self.seed)
         self.agents = {}
         self.names = {}
-        self.points_gain_history = {}
-        self._prev_points = {}
+        self.points_history = PointsHistory(window=100)
+        self.series = SeriesStore()
+        self.rank_index = RankIndex()
+        self.rank_movers = {}
+        self._points_changed = set()
         self.current_auctions = {}
         self.current_rolls = {} 
         self.current_bids = defaultdict(list)
@@ -171,8 +201,12 @@ class AuctionHouse:
         self.num_rounds_in_game = 10
         self.priority = {}
         self.gold_in_pool = 0
+
         self.set_num_rounds(10)
         self._find_log_file()
+
+        if self.journal is not None:
+            self.journal.new_game(self)
         
     
     def assign_priorities(self):
@@ -180,7 +214,7 @@ class AuctionHouse:
         used = set()
         for a_id in self.agents.keys():
             while True:
-                p = random.randint(1, 10**9)
+                p = self.rng.randint(1, 10**9)
                 if p not in used:
                     used.add(p)
                     self.priority[a_id] = p
@@ -201,18 +235,29 @@ class AuctionHouse:
                     
         self.agents[a_id] = {"gold": 0, "points": 0}
         self.names[a_id] = name
-        self.points_gain_history.setdefault(a_id, [])
-        self._prev_points.setdefault(a_id, 0)
+        self.rank_index.add(a_id, 0)
+        self.points_history.add_agent(a_id, 0)
+        self.series.add_agent(a_id)
+
+        if self.journal is not None:
+            self.journal.write({"t": "join", "name": name, "a_id": a_id, "player_id": player_id})
     
     
     def prepare_auctions_and_pool(self):        
+        for a_id in self._points_changed:
+            self.rank_index.update(a_id, self.agents[a_id]["points"])
+        self._points_changed = set()
+        self.rank_movers = self.rank_index.settle()
+
         prev_auctions = self.current_auctions
         prev_bids = self.current_bids
         prev_rolls = self.current_rolls
         
         self.current_bids = defaultdict(list)
-        self.current_auctions, self.current_rolls = self._generate_auctions()
+        with tracer.span("generate auctions"):
+            self.current_auctions, self.current_rolls = self._generate_auctions()
 
+        t_build = time.perf_counter()
         # copy the pool buys to broodcast, reset the pool buys
         buy_pool_copy = self.current_pool_buys.copy()
         self.current_pool_buys = {} 
@@ -257,30 +302,30 @@ class AuctionHouse:
             "remainder_bank_limit": self.bank_limit_per_round[self.round_counter:],
             "remainder_bank_interest": self.bank_interest_per_round[self.round_counter:],
         }
+        tracer.complete("build state", t_build, time.perf_counter())
 
         if self.save_logs and self.log_file is not None:
             try:
-                with open(self.log_file, "a") as fp:
+                with tracer.span("log write"), open(self.log_file, "a") as fp:
                     fp.write("{}\n".format(json.dumps(state)))
             except Exception as e:
                 print("error writing auction log:", e)
                 self.save_logs = False
         
-        for a_id, info in self.agents.items():
-            current_points = info.get("points", 0)
-            prev_points = self._prev_points.get(a_id, 0)
-            gain = current_points - prev_points
-            history = self.points_gain_history.get(a_id)
-            if history is None:
-                history = []
-            history.append(gain)
-            if len(history) > 100:
-                history = history[-100:]
-            self.points_gain_history[a_id] = history
-            self._prev_points[a_id] = current_points
+        with tracer.span("record history"):
+            self.points_history.record(self.agents)
+            self.series.record(self.agents)
 
         self.round_counter += 1
+
+        if self.journal is not None:
+            self.journal.write({"t": "tick", "round": self.round_counter, "digest": self.ledger_digest()})
         return state
+
+    def ledger_digest(self) -> str:
+        """SHA-256 of everything a round settles: gold and points of every agent, the pool and the priorities."""
+        ledger = [self.round_counter, self.gold_in_pool, self.agents, self.priority]
+        return hashlib.sha256(json.dumps(ledger, separators=(",", ":")).encode("utf-8")).hexdigest()
         
   
     def _generate_auctions(self) -> Dict[str, dict]:
@@ -292,17 +337,17 @@ class AuctionHouse:
         n_auctions = int(math.ceil(self.auctions_per_agent*len(self.agents)))
                 
         for _ in range(n_auctions):
-            i = random.choices(indices, weights=self.die_prob, k=1)[0]            
+            i = self.rng.choices(indices, weights=self.die_prob, k=1)[0]            
             die = self.die_sizes[i]
-            n_dices = random.randint(1, self.max_n_die[i])
-            bonus = random.randint(self.min_bonus[i], self.max_bonus[i])
+            n_dices = self.rng.randint(1, self.max_n_die[i])
+            bonus = self.rng.randint(self.min_bonus[i], self.max_bonus[i])
                                     
             auction_id = "a{}".format(self.auction_counter)
             a = {"die": die, "num": n_dices, "bonus": bonus}
             auctions[auction_id] = a
             self.auction_counter += 1
             
-            points = sum( (random.randint(1, a["die"]) for _ in range(a["num"])) )
+            points = sum( (self.rng.randint(1, a["die"]) for _ in range(a["num"])) )
             points += a["bonus"]
             rolls[auction_id] = points
                     
@@ -318,6 +363,11 @@ class AuctionHouse:
             
         # register the negative amount of points (if any)
         self.agents[a_id]["points"] -= points
+        if points > 0:
+            self._points_changed.add(a_id)
+
+        if self.journal is not None:
+            self.journal.write({"t": "pool", "a_id": a_id, "points": points})
 
     
     def process_pool_buys(self):
@@ -336,24 +386,29 @@ class AuctionHouse:
 
 
 
-    def register_bid(self, a_id:str, auction_id:str, gold:int):       
+    def register_bid(self, a_id:str, auction_id:str, gold:int) -> str:
+        """Returns "accepted" or why the bid was rejected."""
         if auction_id not in self.current_auctions:
-            return
+            return "unknown_auction"
         
         if a_id not in self.agents:
-            return
+            return "unknown_agent"
 
         gold = int(gold)
         if gold < 1:
-            return
+            return "invalid_amount"
 
                 
         if self.agents[a_id]["gold"] < gold:
-            return
+            return "insufficient_gold"
 
         self.current_bids[auction_id].append( (a_id, gold) )
         self.agents[a_id]["gold"] -= gold
 
+        if self.journal is not None:
+            self.journal.write({"t": "bid", "a_id": a_id, "auction_id": auction_id, "gold": gold})
+        return "accepted"
+
     
     def process_all_bids(self):        
 
@@ -373,7 +428,7 @@ class AuctionHouse:
                 losers_tied = [a for a in tied if a != winner]
                 if losers_tied:
                     weights = [1.0 / max(self.priority.get(a, 1), 1) for a in losers_tied]
-                    swap_with = random.choices(losers_tied, weights=weights, k=1)[0]
+                    swap_with = self.rng.choices(losers_tied, weights=weights, k=1)[0]
                     pw = self.priority.get(winner, 0)
                     pl = self.priority.get(swap_with, 0)
                     self.priority[winner] = pl
@@ -383,6 +438,7 @@ class AuctionHouse:
             for a_id, bid in bids:
                 if a_id == winner and bid == win_amount:
                     self.agents[a_id]["points"] += points
+                    self._points_changed.add(a_id)
                 else:
                     back_value = int(bid * self.gold_back_fraction)
                     removed_value = max(0, bid - back_value)
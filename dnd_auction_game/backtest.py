@@ -0,0 +1,294 @@
+"""Counterfactual backtests: how would another make_bid have done in the games an agent logged?
+
+    python -m dnd_auction_game.backtest my_new_agent.py logs/ --out backtest.json
+
+Every round of an agent log (logs/agent_*.jsonl or .jsonl.gz) is replayed with the new make_bid in
+place of the logged agent. Its bids are settled against the recorded bids of the other agents and
+the recorded rolls, through AuctionHouse's own settlement (pool buys, ties, refunds), then the bank
+pays interest and income as it did in the game. The other agents play exactly as recorded, so the
+new strategy is measured against the games as they happened, without their reaction to it.
+"""
+import io
+import os
+import sys
+import glob
+import gzip
+import json
+import random
+import argparse
+import contextlib
+import multiprocessing
+from typing import Callable, Dict, Iterator, List, Optional
+
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.host import load_strategy
+
+
+# priorities are not in the logs: "lose" gives every tie to the other agents, "win" to the new
+# strategy, "random" draws the priorities every round
+TIE_POLICIES = ("lose", "win", "random")
+
+
+def read_rounds(path:str) -> Iterator[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as fp:
+        for line in fp:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class _PinnedPriority(dict):
+    """Priorities process_all_bids cannot swap after a tie, so a tie policy holds for the whole round."""
+    def __setitem__(self, key, value):
+        pass
+
+
+def _settlement_house() -> AuctionHouse:
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="backtest", play_token="backtest", save_logs=False, seed=0)
+    house.log_player_id_file = os.devnull
+    return house
+
+
+def _bank_state(round_data:dict) -> dict:
+    return {
+        "gold_income_per_round": round_data["remainder_gold_income"],
+        "bank_interest_per_round": round_data["remainder_bank_interest"],
+        "bank_limit_per_round": round_data["remainder_bank_limit"],
+    }
+
+
+def _with_own_bids(prev_auctions:dict, a_id:str, own_bids:Dict[str, int]) -> dict:
+    """The recorded prev_auctions with the logged agent's bids swapped for the new strategy's."""
+    out = {}
+    for auction_id, info in prev_auctions.items():
+        bids = [b for b in info["bids"] if b["a_id"] != a_id]
+        if auction_id in own_bids:
+            bids.append({"a_id": a_id, "gold": own_bids[auction_id]})
+            bids.sort(key=lambda b: b["gold"], reverse=True)
+        out[auction_id] = dict(info, bids=bids)
+    return out
+
+
+def backtest_rounds(rounds:Iterator[dict], make_bid:Callable, a_id:Optional[str]=None, ties:str="lose",
+                    seed:int=0) -> Dict[str, object]:
+    """Plays make_bid through one logged game. Returns the recorded and the counterfactual end state."""
+    if ties not in TIE_POLICIES:
+        raise ValueError("unknown tie policy: '{}'".format(ties))
+
+    house = _settlement_house()
+    rng = random.Random(seed)
+
+    result = {"agent": a_id, "rounds": 0, "skipped_rounds": 0, "auction_points": 0, "gold_bid": 0, "errors": 0}
+    gold = points = None
+    own_bids = {}
+    pool_buy = 0
+    prev = None
+
+    for cur in rounds:
+        if a_id is None:
+            a_id = result["agent"] = cur.get("current_agent")
+        if a_id not in cur["states"]:
+            continue
+
+        if prev is None or cur["round"] != prev["round"] + 1:
+            # the first round seen, or a gap (reconnect): continue from the recorded state
+            if prev is not None:
+                result["skipped_rounds"] += 1
+            gold, points = cur["states"][a_id]["gold"], cur["states"][a_id]["points"]
+        else:
+            gold, points = _settle(house, prev, cur, a_id, gold, points, own_bids, pool_buy, ties, rng, result)
+            result["rounds"] += 1
+
+        states = dict(cur["states"])
+        states[a_id] = {"gold": gold, "points": points}
+        prev_auctions = _with_own_bids(cur["prev_auctions"], a_id, own_bids) if prev is not None else cur["prev_auctions"]
+
+        try:
+            decision = make_bid(a_id, cur["round"], states, cur["auctions"], prev_auctions, cur["pool"],
+                                cur["prev_pool_buys"], _bank_state(cur)) or {}
+            bids = decision.get("bids", {}) or {}
+            pool_buy = decision.get("pool", 0) or 0
+        except Exception as e:
+            result["errors"] += 1
+            if result["errors"] == 1:
+                print("error in make_bid (round {}): {}".format(cur["round"], e))
+            bids, pool_buy = {}, 0
+
+        own_bids = bids
+        prev = cur
+
+    if prev is None:
+        result["error"] = "no rounds of the agent"
+        return result
+
+    recorded = prev["states"][a_id]
+    result.update({
+        "final_round": prev["round"],
+        "recorded_gold": recorded["gold"],
+        "recorded_points": recorded["points"],
+        "gold": gold,
+        "points": points,
+        "points_delta": points - recorded["points"],
+        "gold_delta": gold - recorded["gold"],
+    })
+    return result
+
+
+def _settle(house:AuctionHouse, prev:dict, cur:dict, a_id:str, gold:int, points:int, own_bids:dict, pool_buy,
+            ties:str, rng:random.Random, result:dict):
+    """Settles round prev with the new bids, cur holds what the other agents did in it. Returns gold, points."""
+    house.agents = {a_id: {"gold": gold, "points": points}}
+    house.current_auctions = prev["auctions"]
+    house.current_rolls = {}
+    house.current_bids.clear()
+    house.current_pool_buys = {}
+    house._points_changed = set()
+    house.gold_in_pool = prev["pool"]
+
+    others = set()
+    for auction_id, info in cur["prev_auctions"].items():
+        house.current_rolls[auction_id] = info["reward"]
+        for bid in info["bids"]:
+            if bid["a_id"] != a_id:
+                house.current_bids[auction_id].append((bid["a_id"], bid["gold"]))
+                others.add(bid["a_id"])
+    for other, buy in cur["prev_pool_buys"].items():
+        if other != a_id:
+            house.current_pool_buys[other] = buy
+            others.add(other)
+
+    for other in others:
+        house.agents[other] = {"gold": 0, "points": 0}
+
+    # registered the way the server does: the pool buy, then the bids in order against the gold left
+    try:
+        if pool_buy > 0:
+            house.register_pool_buy(a_id, pool_buy)
+        for auction_id, bid in own_bids.items():
+            try:
+                if house.register_bid(a_id, auction_id, bid) == "accepted":
+                    result["gold_bid"] += int(bid)
+            except (TypeError, ValueError):
+                pass
+    except Exception:
+        result["errors"] += 1
+
+    priority = {other: rng.randint(1, 10**9) for other in sorted(others)}
+    if ties == "random":
+        # the engine's own tie rule, the winner swaps priorities with a tied loser
+        priority[a_id] = rng.randint(1, 10**9)
+        house.priority = priority
+    else:
+        priority[a_id] = 0 if ties == "lose" else 10**9 + 1
+        house.priority = _PinnedPriority(priority)
+
+    points_before = house.agents[a_id]["points"]
+    house.process_pool_buys()
+    house.process_all_bids()
+
+    agent = house.agents[a_id]
+    result["auction_points"] += agent["points"] - points_before
+
+    # the bank, as prepare_auctions_and_pool pays it before the next round is sent
+    upper_rate = cur["remainder_bank_limit"][0]
+    interest_rate = cur["remainder_bank_interest"][0]
+    gold_income = cur["remainder_gold_income"][0]
+    agent["gold"] += int(min(agent["gold"], upper_rate) * (interest_rate - 1))
+    agent["gold"] += gold_income
+
+    return agent["gold"], agent["points"]
+
+
+def find_logs(paths:List[str]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, "agent_*.jsonl")) + glob.glob(os.path.join(path, "agent_*.jsonl.gz"))))
+        else:
+            found.extend(sorted(glob.glob(path)))
+    return found
+
+
+_strategy_path = None
+
+
+def _init_worker(strategy_path:str):
+    global _strategy_path
+    _strategy_path = strategy_path
+
+
+def _backtest_file(job) -> Dict[str, object]:
+    i, path, a_id, ties, seed = job
+    try:
+        # a fresh module per game, strategies that keep state in globals start clean
+        make_bid = load_strategy(_strategy_path, instance=i)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = backtest_rounds(read_rounds(path), make_bid, a_id=a_id, ties=ties, seed=seed + i)
+        sys.modules.pop("_hosted_{}_{}".format(os.path.splitext(os.path.basename(_strategy_path))[0], i), None)
+    except Exception as e:
+        result = {"agent": a_id, "error": "{}: {}".format(type(e).__name__, e)}
+    result["path"] = path
+    return result
+
+
+def backtest(strategy_path:str, paths:List[str], a_id:Optional[str]=None, ties:str="lose", seed:int=0,
+             processes:Optional[int]=None) -> List[Dict[str, object]]:
+    jobs = [(i, path, a_id, ties, seed) for i, path in enumerate(paths)]
+    if processes == 1 or len(jobs) < 2:
+        _init_worker(strategy_path)
+        return [_backtest_file(job) for job in jobs]
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(strategy_path,)) as pool:
+        return list(pool.imap_unordered(_backtest_file, jobs))
+
+
+def print_report(results:List[Dict[str, object]]):
+    ok = [r for r in results if "error" not in r]
+    for r in results:
+        if "error" in r:
+            print("ERROR  {}  {}".format(r["path"], r["error"]))
+
+    if not ok:
+        print("no games backtested")
+        return
+
+    n = len(ok)
+    better = sum(1 for r in ok if r["points_delta"] > 0)
+    worse = sum(1 for r in ok if r["points_delta"] < 0)
+    print("{} games, {} rounds ({} skipped)".format(n, sum(r["rounds"] for r in ok), sum(r["skipped_rounds"] for r in ok)))
+    print("points: {:.1f} recorded -> {:.1f} backtested per game (mean delta {:+.1f}), better in {}, worse in {}".format(
+        sum(r["recorded_points"] for r in ok) / n, sum(r["points"] for r in ok) / n,
+        sum(r["points_delta"] for r in ok) / n, better, worse))
+    print("gold at the end: {:.0f} recorded -> {:.0f} backtested per game, {:.0f} gold bid and {:.1f} points won in auctions per game".format(
+        sum(r["recorded_gold"] for r in ok) / n, sum(r["gold"] for r in ok) / n, sum(r["gold_bid"] for r in ok) / n,
+        sum(r["auction_points"] for r in ok) / n))
+    errors = sum(r["errors"] for r in ok)
+    if errors:
+        print("<WARNING: make_bid raised in {} rounds, those rounds had no bids>".format(errors))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a make_bid against recorded agent logs.")
+    parser.add_argument("strategy", help="agent file with the make_bid to test")
+    parser.add_argument("logs", nargs="+", help="agent logs, globs or directories (default pattern agent_*.jsonl[.gz])")
+    parser.add_argument("--agent", default=None, help="agent id to replace (default: the agent that wrote the log)")
+    parser.add_argument("--ties", choices=TIE_POLICIES, default="lose", help="who wins a tie with the new strategy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--out", default=None, help="write the per game results as JSON")
+    args = parser.parse_args()
+
+    paths = find_logs(args.logs)
+    if not paths:
+        print("<ERROR: no agent logs found>")
+        sys.exit(1)
+
+    results = backtest(args.strategy, paths, a_id=args.agent, ties=args.ties, seed=args.seed, processes=args.processes)
+    print_report(results)
+
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(results, fp, indent=1)
+        print("results written to: '{}'".format(args.out))
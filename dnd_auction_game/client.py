@@ -2,22 +2,105 @@
 import random
 import asyncio
 import json
+import gzip
+import inspect
 import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 
 import machineid
 import websockets
 from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
 
+from dnd_auction_game.transport import LocalConnectionClosed, local_connect
+
+
+def connect_to_server(host:str, port:int, path:str, transport:str="tcp", unix_socket:str=None):
+    """Opens a connection to the game server.
+
+    transport: "tcp" (websocket over the network), "unix" (websocket over a Unix domain socket,
+    start the server with 'uvicorn dnd_auction_game.server:app --uds <path>') or "local"
+    (in-process queues, the agents run inside the server process).
+    """
+    if transport == "tcp":
+        connection_str = "ws://{}:{}{}".format(host, port, path)
+        print("connecting to: {}".format(connection_str))
+        return websockets.connect(connection_str)
+
+    if transport == "unix":
+        print("connecting to: {} on unix socket {}".format(path, unix_socket))
+        return websockets.unix_connect(unix_socket, "ws://localhost{}".format(path))
+
+    if transport == "local":
+        print("connecting to: {} in-process".format(path))
+        return local_connect(path)
+
+    raise ValueError("Unknown transport: '{}'".format(transport))
+
+
+class AgentLogWriter:
+    """Appends received rounds to the agent log through one persistent, buffered handle.
+
+    Each line is the raw frame from the server with a small header spliced in front,
+    so a round is never parsed or re-serialized just to be logged.
+    """
+    def __init__(self, path:str, compress:bool=False, buffer_size:int=1 << 20):
+        self.path = path
+        if compress:
+            self.fp = gzip.open(path, "ab", compresslevel=6)
+        else:
+            self.fp = open(path, "ab", buffering=buffer_size)
+
+    def write_round(self, raw, header:dict):
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+
+        body = raw.strip()[1:].lstrip()
+        prefix = json.dumps(header).encode("utf-8")[:-1]
+        if body == b"}":
+            self.fp.write(prefix + b"}\n")
+        else:
+            self.fp.write(prefix + b", " + body + b"\n")
+
+    def flush(self):
+        self.fp.flush()
+
+    def close(self):
+        try:
+            self.fp.close()
+        except Exception as e:
+            print("error closing agent log:", e)
+
 
 class AuctionGameClient:
-    def __init__(self, host:str, agent_name:str, token:str="play123", player_id:str="<identifier>", port:int=8000):
+    def __init__(self, host:str, agent_name:str, token:str="play123", player_id:str="<identifier>", port:int=8000,
+                 log_compress:bool=False, executor=None, bid_deadline:float=None, deadline_fallback:str="empty",
+                 agent_id_suffix:str=None, transport:str="tcp", unix_socket:str="/tmp/dnd_auction_game.sock"):
         self.host = host
         self.port = port
+        self.transport = transport
+        self.unix_socket = unix_socket
         self.player_id = player_id
 
         self.token = token
         self.agent_name = agent_name        
         self.log_file = None
+        self.log_compress = log_compress
+
+        # executor: None (run on the event loop), "thread", "process" or an Executor instance
+        self.executor = executor
+        self.bid_deadline = bid_deadline
+        self.deadline_fallback = deadline_fallback
+        # (round, seconds) of the recent rounds, every round's latency is also in the agent log
+        self.callback_latency = deque(maxlen=1000)
+        self.missed_deadlines = 0
+        self._last_bids = {}
+        self._last_auctions = {}
+        self._pending = None
+
+        if deadline_fallback not in ("empty", "last"):
+            raise ValueError("Unknown deadline fallback: '{}'".format(deadline_fallback))
         
         if len(self.agent_name) < 2:
             raise ValueError("Agent name is too short: '{}'".format(self.agent_name))
@@ -25,17 +108,22 @@ class AuctionGameClient:
         if len(self.agent_name) > 64:
             raise ValueError("Agent name is too long: '{}'".format(self.agent_name))
         
-        if self.host.lower() == "localhost" or self.host == "127.0.0.1":
+        if self.host.lower() == "localhost" or self.host == "127.0.0.1" or self.transport != "tcp":
             self.agent_id = "local_rand_id_{}".format(random.randint(100, 1000000))
         else:
             self.agent_id = machineid.hashed_id('auction-game')
+
+        # several agents hosted from one machine / process need distinct ids
+        if agent_id_suffix is not None:
+            self.agent_id = "{}_{}".format(self.agent_id, agent_id_suffix)
         
         if not os.path.isdir("logs"):            
             print("unable to find ./logs => creating dir.")
             os.makedirs("logs")
         
         n_id = len(os.listdir("logs"))
-        self.log_file = os.path.join("logs", "agent_{}_n{}.jsonl".format(self.agent_id, n_id))
+        log_ext = "jsonl.gz" if self.log_compress else "jsonl"
+        self.log_file = os.path.join("logs", "agent_{}_n{}.{}".format(self.agent_id, n_id, log_ext))
         
         print("logging to file: '{}'".format(self.log_file))
 
@@ -44,17 +132,146 @@ class AuctionGameClient:
         asyncio.run(self._internal_run(bid_callback))
         print("<run done>")
 
-    async def _internal_run(self, bid_callback):
+    async def run_async(self, bid_callback):
+        """Plays one game on an already running event loop (used to host many agents in one process)."""
+        await self._internal_run(bid_callback)
+
+    def _create_executor(self):
+        """Returns (executor, owned) where owned executors are shut down after the game."""
+        if self.executor is None or isinstance(self.executor, Executor):
+            return self.executor, False
+
+        # a single worker keeps the strategy state in one thread / process
+        if self.executor == "thread":
+            return ThreadPoolExecutor(max_workers=1), True
+
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=1), True
+
+        raise ValueError("Unknown executor: '{}'".format(self.executor))
+
+    def _fallback_bids(self, auctions:dict):
+        if self.deadline_fallback != "last" or not isinstance(self._last_bids, dict):
+            return {}
+
+        # auction ids are new every round: the last bids go to the current auctions that rank the same by expected value
+        def by_value(auctions):
+            return sorted(auctions, key=lambda a: (auctions[a]["die"] + 1) / 2 * auctions[a]["num"] + auctions[a]["bonus"], reverse=True)
+
+        last_bids = self._last_bids.get("bids", {}) or {}
+        ranked_last = [a for a in by_value(self._last_auctions) if a in last_bids]
+        fallback = {"bids": {auction_id: last_bids[last_id] for auction_id, last_id in zip(by_value(auctions), ranked_last)}}
+        if self._last_bids.get("pool"):
+            fallback["pool"] = self._last_bids["pool"]
+        return fallback
+
+    async def _call_strategy(self, bid_callback, args, executor, timeout:float):
+        """Runs one decision. Returns (bids, missed); bids is None when nothing was produced in time."""
+        if inspect.isasyncgenfunction(bid_callback):
+            return await self._call_streaming_strategy(bid_callback, args, timeout)
+
+        if inspect.iscoroutinefunction(bid_callback):
+            try:
+                return await asyncio.wait_for(bid_callback(*args), timeout=timeout), False
+            except asyncio.TimeoutError:
+                return None, True
+
+        if executor is None:
+            t_start = time.perf_counter()
+            new_bids = bid_callback(*args)
+            return new_bids, timeout is not None and time.perf_counter() - t_start > timeout
+
+        # a call that missed its deadline keeps the worker, this round would queue behind it and miss too
+        if self._pending is not None and not self._pending.done():
+            return None, True
+
+        future = asyncio.get_running_loop().run_in_executor(executor, bid_callback, *args)
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending = future
+        try:
+            # shielded, the future stays pending while the worker is still running the call
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout), False
+        except asyncio.TimeoutError:
+            return None, True
+
+    async def _call_streaming_strategy(self, bid_callback, args, timeout:float):
+        """The strategy yields provisional bids and refines them, the latest one before the deadline is sent."""
+        latest = None
+        stream = bid_callback(*args)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    latest = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    break
+        finally:
+            await stream.aclose()
+
+        return latest, latest is None
+
+    async def _make_bids(self, bid_callback, round_data, executor, t_received:float):
+        bank_state = {}
+        bank_state["gold_income_per_round"] = round_data["remainder_gold_income"]
+        bank_state["bank_interest_per_round"] = round_data["remainder_bank_interest"]
+        bank_state["bank_limit_per_round"] = round_data["remainder_bank_limit"]
+
+        args = (self.agent_id,
+                round_data["round"],
+                round_data["states"],
+                round_data["auctions"],
+                round_data["prev_auctions"],
+                round_data["pool"],
+                round_data["prev_pool_buys"],
+                bank_state)
+
+        timeout = None
+        if self.bid_deadline is not None:
+            timeout = max(0.0, self.bid_deadline - (time.perf_counter() - t_received))
+
+        t_start = time.perf_counter()
+        new_bids, missed = await self._call_strategy(bid_callback, args, executor, timeout)
+        if missed:
+            new_bids = self._fallback_bids(round_data["auctions"])
+
+        latency = time.perf_counter() - t_start
+        self.callback_latency.append((round_data["round"], latency))
+
+        if missed:
+            self.missed_deadlines += 1
+            print("<WARNING: bid callback missed the deadline in round {} ({:.3f}s)>".format(round_data["round"], latency))
+        else:
+            self._last_bids = new_bids
+            self._last_auctions = round_data["auctions"]
+
+        return new_bids, latency, missed
+
+    def _agent_info(self):
         agent_info = {}
         agent_info["name"] = self.agent_name
         agent_info["a_id"] = self.agent_id
         agent_info["player_id"] = self.player_id[0:128]
+        return agent_info
 
-        connection_str = "ws://{}:{}/ws/{}".format(self.host, self.port, self.token)
-        print("connecting to: {}".format(connection_str))
+    def _log_header(self, latency:float, missed:bool):
+        log_header = {"current_agent": self.agent_id, "callback_latency": round(latency, 6)}
+        if missed:
+            log_header["deadline_missed"] = True
+        return log_header
+
+    async def _internal_run(self, bid_callback):
+        agent_info = self._agent_info()
+
+        # opened with the first round: the server sends nothing before, a failed join leaves no empty log
+        log_writer = None
+        executor, owns_executor = self._create_executor()
 
         try:
-            async with websockets.connect(connection_str) as sock:
+            async with connect_to_server(self.host, self.port, "/ws/{}".format(self.token),
+                                         self.transport, self.unix_socket) as sock:
                 print("<connected to game server>")
                 agent_info_json = json.dumps(agent_info)
                 print(agent_info_json)
@@ -62,46 +279,115 @@ class AuctionGameClient:
                                 
                 while True:
                     round_data_raw = await sock.recv()
+                    t_received = time.perf_counter()
                     round_data = json.loads(round_data_raw)
-                    
-                    round_data["current_agent"] = self.agent_id
-                    with open(self.log_file, "a") as fp:
-                        fp.write("{}\n".format(json.dumps(round_data)))
-                        
-
-                    bank_state = {}
-                    bank_state["gold_income_per_round"] = round_data["remainder_gold_income"]
-                    bank_state["bank_interest_per_round"] = round_data["remainder_bank_interest"]
-                    bank_state["bank_limit_per_round"] = round_data["remainder_bank_limit"]
-                    
-                    new_bids = bid_callback(self.agent_id, 
-                                            round_data["round"],
-                                            round_data["states"],
-                                            round_data["auctions"],
-                                            round_data["prev_auctions"],
-                                            round_data["pool"],
-                                            round_data["prev_pool_buys"],
-                                            bank_state)    
-
-                    await sock.send(json.dumps(new_bids))
+
+                    new_bids, latency, missed = await self._make_bids(bid_callback, round_data, executor, t_received)
+
+                    # the round answered, a late answer is not taken for a bid on the next round
+                    message = dict(new_bids) if isinstance(new_bids, dict) else {}
+                    message["round"] = round_data["round"]
+                    await sock.send(json.dumps(message))
+
+                    # log after the bid is sent, the strategy has the time between recv and send
+                    if log_writer is None:
+                        log_writer = AgentLogWriter(self.log_file, compress=self.log_compress)
+                    log_writer.write_round(round_data_raw, self._log_header(latency, missed))
         
         except ConnectionClosedError:
             print("<ERROR: Connection to server closed>")
         
-        except ConnectionClosedOK:
+        except (ConnectionClosedOK, LocalConnectionClosed):
             pass
 
+        finally:
+            if log_writer is not None:
+                log_writer.close()
+            if owns_executor:
+                executor.shutdown(wait=False)
 
 
-      
+class AuctionGameMuxClient:
+    """Plays many agents over one websocket (the server's /ws_mux endpoint).
 
+    Every agent is described by an AuctionGameClient (name, id, executor, deadline, log file),
+    the round is received and parsed once and the same round data is passed to all strategies,
+    so strategies must not modify their arguments.
+    """
+    def __init__(self, host:str, token:str="play123", port:int=8000, transport:str="tcp",
+                 unix_socket:str="/tmp/dnd_auction_game.sock"):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.transport = transport
+        self.unix_socket = unix_socket
+        self.agents = []
 
+    def add_agent(self, client:AuctionGameClient, bid_callback):
+        self.agents.append((client, bid_callback))
 
+    def run(self):
+        asyncio.run(self._internal_run())
+        print("<run done>")
 
+    async def run_async(self):
+        await self._internal_run()
 
+    async def _internal_run(self):
+        log_writers = {}
+        executors = {}
+        owned_executors = []
+        for client, _ in self.agents:
+            executor, owns_executor = client._create_executor()
+            executors[client.agent_id] = executor
+            if owns_executor:
+                owned_executors.append(executor)
 
+        try:
+            async with connect_to_server(self.host, self.port, "/ws_mux/{}".format(self.token),
+                                         self.transport, self.unix_socket) as sock:
+                print("<connected to game server>")
+                await sock.send(json.dumps({"agents": [client._agent_info() for client, _ in self.agents]}))
 
+                registered = set(json.loads(await sock.recv()).get("registered", []))
+                agents = [(client, cb) for client, cb in self.agents if client.agent_id in registered]
+                print("<registered {} of {} agents>".format(len(agents), len(self.agents)))
+                # only the agents that joined get a log
+                for client, _ in agents:
+                    log_writers[client.agent_id] = AgentLogWriter(client.log_file, compress=client.log_compress)
 
+                while True:
+                    round_data_raw = await sock.recv()
+                    t_received = time.perf_counter()
+                    round_data = json.loads(round_data_raw)
+
+                    results = await asyncio.gather(
+                        *(client._make_bids(cb, round_data, executors[client.agent_id], t_received) for client, cb in agents),
+                        return_exceptions=True,
+                    )
+
+                    # one failing strategy must not take the other agents on the connection down
+                    for i, result in enumerate(results):
+                        if isinstance(result, Exception):
+                            print("<ERROR: agent {} failed: {}>".format(agents[i][0].agent_name, result))
+                            results[i] = ({}, 0.0, True)
+
+                    combined = {}
+                    for (client, _), (new_bids, _, _) in zip(agents, results):
+                        combined[client.agent_id] = new_bids
+                    await sock.send(json.dumps({"round": round_data["round"], "agents": combined}))
 
+                    for (client, _), (_, latency, missed) in zip(agents, results):
+                        log_writers[client.agent_id].write_round(round_data_raw, client._log_header(latency, missed))
 
+        except ConnectionClosedError:
+            print("<ERROR: Connection to server closed>")
+
+        except (ConnectionClosedOK, LocalConnectionClosed):
+            pass
 
+        finally:
+            for log_writer in log_writers.values():
+                log_writer.close()
+            for executor in owned_executors:
+                executor.shutdown(wait=False)
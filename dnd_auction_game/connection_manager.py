@@ -1,18 +1,29 @@
-from typing import List
+from typing import Callable, Dict, List, Sequence
 import asyncio
+import json
+import time
 from fastapi import (
     WebSocket,
 )
 
+from dnd_auction_game.tracing import tracer
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # the agents playing over each connection (several for /ws_mux), for per-agent payloads
+        self.agent_ids: Dict[WebSocket, Sequence[str]] = {}
 
-    async def add_connection(self, websocket: WebSocket):
+    async def add_connection(self, websocket: WebSocket, a_ids: Sequence[str] = ()):
         self.active_connections.append(websocket)
+        self.agent_ids[websocket] = tuple(a_ids)
+
+    def connected_agent_ids(self) -> List[str]:
+        return [a_id for a_ids in self.agent_ids.values() for a_id in a_ids]
 
     def disconnect(self, websocket: WebSocket):
+        self.agent_ids.pop(websocket, None)
         try:
             self.active_connections.remove(websocket)
         except ValueError: #already removed from list
@@ -28,23 +39,97 @@ class ConnectionManager:
                 pass
 
         self.active_connections = []
+        self.agent_ids = {}
 
     async def send_message(self, message: dict, websocket: WebSocket):
         await websocket.send_json(message)
 
-    async def broadcast(self, message: dict, timeout: float = 1.0):
-        stale = []
-        for connection in list(self.active_connections):
-            try:
-                await asyncio.wait_for(connection.send_json(message), timeout=timeout)
-            except Exception:
-                stale.append(connection)
+    async def broadcast(self, message: dict, timeout: float = 1.0) -> int:
+        """Serializes the message once and sends the same text to every connection.
+
+        Returns the size of the payload in bytes.
+        """
+        text = json.dumps(message, separators=(",", ":"))
+        await self.broadcast_text(text, timeout=timeout)
+        return len(text)
+
+    async def _traced_send(self, connection: WebSocket, text: str):
+        start = time.perf_counter()
+        try:
+            await connection.send_text(text)
+        finally:
+            # keyed by the connection, the sends of one connection share a track across rounds
+            tracer.async_span("send", id(connection), start, time.perf_counter(), bytes=len(text))
+
+    async def broadcast_text(self, text: str, timeout: float = 1.0):
+        connections = list(self.active_connections)
+        await self._send_all(connections, [text] * len(connections), timeout)
+
+    async def broadcast_each(self, text_for: Callable[[Sequence[str]], str], timeout: float = 1.0):
+        """Sends every connection its own text, text_for(a_ids) gets the agents of the connection."""
+        connections = list(self.active_connections)
+        texts = [text_for(self.agent_ids.get(connection, ())) for connection in connections]
+        await self._send_all(connections, texts, timeout)
+
+    async def _send_all(self, connections: List[WebSocket], texts: List[str], timeout: float):
+        if tracer.enabled:
+            sends = [self._traced_send(connection, text) for connection, text in zip(connections, texts)]
+        else:
+            sends = [connection.send_text(text) for connection, text in zip(connections, texts)]
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(send, timeout=timeout) for send in sends),
+            return_exceptions=True,
+        )
+
+        stale = [ws for ws, result in zip(connections, results) if isinstance(result, BaseException)]
         for ws in stale:
             try:
                 await ws.close()
             except:
                 pass
-            try:
-                self.active_connections.remove(ws)
-            except ValueError:
-                pass
+            self.disconnect(ws)
+
+
+class SpectatorChannel:
+    """Read-only round feed: the text the agents were sent, relayed to every spectator.
+
+    publish() only queues the one serialized payload per spectator, each spectator has its own
+    sender task, so a slow spectator never holds up the tick or the others. A queue holds at most
+    `queue_size` rounds, the oldest round is dropped when a spectator falls behind.
+    """
+    def __init__(self, queue_size: int = 2):
+        self.queue_size = max(1, queue_size)
+        self.latest = None
+        self._queues: Dict[WebSocket, asyncio.Queue] = {}
+
+    def __len__(self):
+        return len(self._queues)
+
+    def add(self, websocket: WebSocket) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        # a spectator starts from the current round
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self._queues[websocket] = queue
+        return queue
+
+    def remove(self, websocket: WebSocket):
+        self._queues.pop(websocket, None)
+
+    def publish(self, text: str) -> int:
+        """Queues the round for every spectator, returns the number of stale rounds dropped."""
+        self.latest = text
+        dropped = 0
+        for queue in self._queues.values():
+            if queue.full():
+                queue.get_nowait()
+                dropped += 1
+            queue.put_nowait(text)
+        return dropped
+
+    async def pump(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Sends the spectator's queue until the connection fails."""
+        while True:
+            text = await queue.get()
+            await websocket.send_text(text)
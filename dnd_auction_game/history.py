@@ -0,0 +1,255 @@
+from typing import Dict, List
+
+import numpy as np
+
+
+class PointsHistory:
+    """The last `window` rounds of every agent's points, in preallocated [agents, 2 * window] arrays.
+
+    Each round is written twice, at column head and head + window, so the most recent k rounds
+    are always one contiguous slice of a row: reading a window is a view, recording a round
+    allocates nothing per agent.
+    """
+    def __init__(self, window:int=100, capacity:int=64):
+        self.window = window
+
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+
+        capacity = max(1, capacity)
+        self._gains = np.zeros((capacity, 2 * window), dtype=np.int64)
+        self._totals = np.zeros((capacity, 2 * window), dtype=np.int64)
+        self._prev_points = np.zeros(capacity, dtype=np.int64)
+        self._length = np.zeros(capacity, dtype=np.int64)  # rounds recorded per agent, capped at window
+
+        self._head = 0
+
+    def __contains__(self, a_id:str):
+        return a_id in self._row
+
+    def add_agent(self, a_id:str, points:int=0):
+        if a_id in self._row:
+            return
+
+        row = len(self._ids)
+        if row >= self._gains.shape[0]:
+            # amortized: the arrays double when the lobby outgrows them
+            capacity = 2 * self._gains.shape[0]
+            self._gains = np.resize(self._gains, (capacity, 2 * self.window))
+            self._totals = np.resize(self._totals, (capacity, 2 * self.window))
+            self._prev_points = np.resize(self._prev_points, capacity)
+            self._length = np.resize(self._length, capacity)
+
+        self._gains[row] = 0
+        self._totals[row] = 0
+        self._prev_points[row] = points
+        self._length[row] = 0
+
+        self._ids.append(a_id)
+        self._row[a_id] = row
+
+    def record(self, agents:Dict[str, dict]):
+        """Appends one round: the gain since the last round and the running total of every agent."""
+        n = len(self._ids)
+        if n == 0:
+            return
+
+        points = np.fromiter((agents[a_id]["points"] for a_id in self._ids), dtype=np.int64, count=n)
+        gains = points - self._prev_points[:n]
+
+        h = self._head
+        w = self.window
+        self._gains[:n, h] = gains
+        self._gains[:n, h + w] = gains
+        self._totals[:n, h] = points
+        self._totals[:n, h + w] = points
+
+        self._prev_points[:n] = points
+        np.minimum(self._length[:n] + 1, w, out=self._length[:n])
+        self._head = (h + 1) % w
+
+    def _window(self, values:np.ndarray, a_id:str, k:int) -> np.ndarray:
+        row = self._row.get(a_id)
+        if row is None:
+            return values[0, 0:0]
+
+        k = min(k, int(self._length[row]))
+        # the newest value sits at column head - 1 + window (and head - 1)
+        end = self._head + self.window
+        return values[row, end - k:end]
+
+    def recent_gains(self, a_id:str, k:int) -> np.ndarray:
+        """Points gained in each of the last k rounds, oldest first (a view)."""
+        return self._window(self._gains, a_id, k)
+
+    def sparkline(self, a_id:str, k:int) -> np.ndarray:
+        """Points after each of the last k rounds, oldest first (a view).
+
+        Same shape as the cumulative gains over the window, shifted by a constant.
+        """
+        return self._window(self._totals, a_id, k)
+
+    def __getstate__(self):
+        # pickled compactly (snapshots): the recorded rows, one copy of the window, rotated to head 0
+        n = len(self._ids)
+        h = self._head
+        w = self.window
+        state = self.__dict__.copy()
+        state["_gains"] = self._gains[:n, h:h + w].copy()
+        state["_totals"] = self._totals[:n, h:h + w].copy()
+        state["_prev_points"] = self._prev_points[:n].copy()
+        state["_length"] = self._length[:n].copy()
+        state["_head"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        n = max(1, len(self._ids))
+        self._gains = np.concatenate([_grow(self._gains, (n, self.window))] * 2, axis=1)
+        self._totals = np.concatenate([_grow(self._totals, (n, self.window))] * 2, axis=1)
+        self._prev_points = np.resize(self._prev_points, n)
+        self._length = np.resize(self._length, n)
+
+
+# field -> dtype, points stay small (sums of dice rolls), gold compounds with the bank interest
+SERIES_FIELDS = {"gold": np.int64, "points": np.int32}
+
+
+def _grow(values:np.ndarray, shape) -> np.ndarray:
+    grown = np.zeros(shape, dtype=values.dtype)
+    grown[:values.shape[0], :values.shape[1]] = values
+    return grown
+
+
+class SeriesStore:
+    """Every agent's gold and points for every round of the game, in columnar [agents, rounds] arrays.
+
+    A row is one agent's whole series, so a history query is one contiguous slice. Both axes
+    grow by doubling, a round costs 12 bytes per agent.
+    """
+    def __init__(self, agent_capacity:int=64, round_capacity:int=1024):
+        self._ids: List[str] = []
+        self._row: Dict[str, int] = {}
+
+        shape = (max(1, agent_capacity), max(1, round_capacity))
+        self._data = {field: np.zeros(shape, dtype=dtype) for field, dtype in SERIES_FIELDS.items()}
+        self._start = np.zeros(shape[0], dtype=np.int64)  # first round recorded for each agent
+
+        self.length = 0  # rounds recorded
+
+    def __contains__(self, a_id:str):
+        return a_id in self._row
+
+    def add_agent(self, a_id:str):
+        if a_id in self._row:
+            return
+
+        row = len(self._ids)
+        agent_capacity, round_capacity = self._data["points"].shape
+        if row >= agent_capacity:
+            for field, values in self._data.items():
+                self._data[field] = _grow(values, (2 * agent_capacity, round_capacity))
+            self._start = np.resize(self._start, 2 * agent_capacity)
+
+        self._start[row] = self.length
+        self._ids.append(a_id)
+        self._row[a_id] = row
+
+    def record(self, agents:Dict[str, dict]):
+        """Appends one round (one column) with the current gold and points of every agent."""
+        n = len(self._ids)
+
+        agent_capacity, round_capacity = self._data["points"].shape
+        if self.length >= round_capacity:
+            for field, values in self._data.items():
+                self._data[field] = _grow(values, (agent_capacity, 2 * round_capacity))
+
+        col = self.length
+        for field, values in self._data.items():
+            values[:n, col] = np.fromiter((agents[a_id][field] for a_id in self._ids), dtype=values.dtype, count=n)
+
+        self.length += 1
+
+    def series(self, a_id:str, field:str):
+        """(rounds, values) of one agent since it joined, both views."""
+        row = self._row[a_id]
+        start = int(self._start[row])
+        rounds = np.arange(start, self.length)
+        return rounds, self._data[field][row, start:self.length]
+
+    def __getstate__(self):
+        # pickled compactly (snapshots): only the recorded agents and rounds, the capacity comes back on load
+        n = len(self._ids)
+        state = self.__dict__.copy()
+        state["_data"] = {field: values[:n, :self.length].copy() for field, values in self._data.items()}
+        state["_start"] = self._start[:n].copy()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        shape = (max(1, len(self._ids)), max(1, self.length))
+        self._data = {field: _grow(values, shape) for field, values in self._data.items()}
+        self._start = np.resize(self._start, shape[0])
+
+
+def downsample_lttb(x:np.ndarray, y:np.ndarray, n:int):
+    """Largest-Triangle-Three-Buckets: n points that keep the visual shape of the series.
+
+    The first and last points are kept, every bucket in between contributes the point that
+    forms the largest triangle with the point picked in the previous bucket and the mean of
+    the next bucket.
+    """
+    size = len(y)
+    n = max(n, 3)
+    if size <= n:
+        return x, y
+
+    xf = x.astype(np.float64)
+    yf = y.astype(np.float64)
+
+    # n - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+
+    picked = np.empty(n, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = size - 1
+
+    a = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = xf[end:edges[i + 2]].mean()
+            next_y = yf[end:edges[i + 2]].mean()
+        else:
+            next_x = xf[-1]
+            next_y = yf[-1]
+
+        area = np.abs((xf[a] - next_x) * (yf[start:end] - yf[a]) - (xf[a] - xf[start:end]) * (next_y - yf[a]))
+        a = start + int(area.argmax())
+        picked[i + 1] = a
+
+    return x[picked], y[picked]
+
+
+def downsample_minmax(x:np.ndarray, y:np.ndarray, n:int):
+    """The lowest and the highest point of each of n / 2 buckets, in round order. Keeps every spike."""
+    size = len(y)
+    n = max(n, 2)
+    if size <= n:
+        return x, y
+
+    n_buckets = n // 2
+    bucket = -(-size // n_buckets)
+
+    # pad with the last value so the series reshapes into [buckets, bucket size]
+    padded = np.empty(n_buckets * bucket, dtype=y.dtype)
+    padded[:size] = y
+    padded[size:] = y[-1]
+    buckets = padded.reshape(n_buckets, bucket)
+
+    offsets = np.arange(n_buckets) * bucket
+    lows = np.minimum(offsets + buckets.argmin(axis=1), size - 1)
+    highs = np.minimum(offsets + buckets.argmax(axis=1), size - 1)
+    picked = np.unique(np.concatenate([lows, highs]))
+
+    return x[picked], y[picked]
@@ -0,0 +1,201 @@
+import sys
+import os
+import ast
+import random
+import asyncio
+import argparse
+import importlib.util
+from pathlib import Path
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+
+from dnd_auction_game.client import AuctionGameClient, AuctionGameMuxClient
+
+
+def load_strategy(path:str, instance:int=0):
+    """Imports an agent file and returns its make_bid.
+
+    Every call creates a fresh module instance, so agents that keep their state in
+    module globals do not share it when the same file is hosted several times.
+    """
+    path = Path(path).resolve()
+    module_name = "_hosted_{}_{}".format(path.stem, instance)
+
+    spec = importlib.util.spec_from_file_location(module_name, str(path))
+    if spec is None:
+        raise ValueError("Unable to import agent file: '{}'".format(path))
+
+    module = importlib.util.module_from_spec(spec)
+    # registered like an import, code that looks its module up (dataclasses, pickle) works
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+
+    make_bid = getattr(module, "make_bid", None)
+    if not callable(make_bid):
+        del sys.modules[module_name]
+        raise ValueError("Agent file has no make_bid: '{}'".format(path))
+
+    return make_bid
+
+
+def has_make_bid(path) -> bool:
+    """True if the file defines make_bid at module level (a mention in a string or a method does not count)."""
+    try:
+        tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return False
+    return any(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "make_bid" for node in tree.body)
+
+
+def discover_agent_files(directory:str=".") -> List[Path]:
+    return [p for p in sorted(Path(directory).glob("*.py")) if has_make_bid(p)]
+
+
+# make_bid of the agents pinned to this worker process, loaded by the pool's initializer
+_worker_strategies = {}
+
+
+def _init_worker(strategies):
+    for path, instance in strategies:
+        _worker_strategies[(path, instance)] = load_strategy(path, instance=instance)
+
+
+class _HostedStrategy:
+    """Calls an agent's make_bid in a worker process. Pickles as (path, instance), so any start method works."""
+    def __init__(self, path:str, instance:int):
+        self.path = path
+        self.instance = instance
+
+    def __call__(self, *args):
+        return _worker_strategies[(self.path, self.instance)](*args)
+
+
+class AgentHost:
+    """Runs many agents in one process: one AuctionGameClient coroutine per agent on a shared event loop."""
+    def __init__(self, host:str="localhost", port:int=8000, token:str="play123", player_id:str="agent_host",
+                 cpu_workers:int=0, bid_deadline:float=None, log_compress:bool=False, multiplex:bool=False,
+                 transport:str="tcp", unix_socket:str="/tmp/dnd_auction_game.sock"):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.player_id = player_id
+        self.bid_deadline = bid_deadline
+        self.log_compress = log_compress
+        # all agents over one websocket (/ws_mux) instead of one connection each
+        self.multiplex = multiplex
+        self.transport = transport
+        self.unix_socket = unix_socket
+
+        self.agents = []
+
+        # one single-worker pool per slot: an agent is pinned to a worker, so its state stays in one process
+        self.cpu_workers = max(0, cpu_workers)
+        self.process_pools = []
+
+    def add_agent(self, path:str, name:str=None):
+        idx = len(self.agents)
+
+        if self.cpu_workers:
+            # the worker loads its own copy (the pool is started with run()), the parent only checks the file
+            if not has_make_bid(path):
+                raise ValueError("Agent file has no make_bid: '{}'".format(path))
+            make_bid = _HostedStrategy(str(Path(path).resolve()), idx)
+            executor = None
+        else:
+            make_bid = load_strategy(path, instance=idx)
+            executor = "thread"
+
+        if name is None:
+            name = "{}_{}".format(Path(path).stem[:56], idx)
+
+        client = AuctionGameClient(host=self.host,
+                                   agent_name=name,
+                                   token=self.token,
+                                   player_id=self.player_id,
+                                   port=self.port,
+                                   log_compress=self.log_compress,
+                                   executor=executor,
+                                   bid_deadline=self.bid_deadline,
+                                   agent_id_suffix="h{}".format(idx),
+                                   transport=self.transport,
+                                   unix_socket=self.unix_socket)
+
+        self.agents.append((client, make_bid))
+        return client
+
+    def _start_process_pools(self):
+        slots = [[] for _ in range(self.cpu_workers)]
+        for idx, (_, make_bid) in enumerate(self.agents):
+            slots[idx % self.cpu_workers].append((make_bid.path, make_bid.instance))
+
+        self.process_pools = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(slot,)) for slot in slots]
+        for idx, (client, _) in enumerate(self.agents):
+            client.executor = self.process_pools[idx % self.cpu_workers]
+
+    async def run_async(self):
+        if self.cpu_workers and not self.process_pools:
+            self._start_process_pools()
+
+        if self.multiplex:
+            mux = AuctionGameMuxClient(host=self.host, token=self.token, port=self.port,
+                                       transport=self.transport, unix_socket=self.unix_socket)
+            for client, make_bid in self.agents:
+                mux.add_agent(client, make_bid)
+            await mux.run_async()
+            return
+
+        results = await asyncio.gather(*(client.run_async(make_bid) for client, make_bid in self.agents),
+                                       return_exceptions=True)
+
+        for (client, _), result in zip(self.agents, results):
+            if isinstance(result, Exception):
+                print("agent {} stopped with error: {}".format(client.agent_name, result))
+
+    def run(self):
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            for pool in self.process_pools:
+                pool.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many agents (files exposing make_bid) in one process.")
+    parser.add_argument("files", nargs="*", help="agent files, default: every *.py in the current directory with a make_bid")
+    parser.add_argument("--num", "-n", type=int, default=None, help="number of agents, files are picked at random (default: one per file)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--token", default=os.environ.get("AH_GAME_TOKEN", "play123"))
+    parser.add_argument("--player-id", default="agent_host")
+    parser.add_argument("--cpu-workers", type=int, default=0, help="run strategies in this many worker processes")
+    parser.add_argument("--deadline", type=float, default=None, help="per-round bid deadline in seconds")
+    parser.add_argument("--unix-socket", default=None, help="connect over this Unix domain socket instead of TCP")
+    parser.add_argument("--multiplex", action="store_true", help="play all agents over one websocket connection")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] or discover_agent_files(".")
+    if not files:
+        print("<ERROR: no agent files with make_bid found>")
+        sys.exit(1)
+
+    chosen = files
+    if args.num is not None:
+        chosen = [random.choice(files) for _ in range(max(1, args.num))]
+
+    agent_host = AgentHost(host=args.host, port=args.port, token=args.token, player_id=args.player_id,
+                           cpu_workers=args.cpu_workers, bid_deadline=args.deadline, multiplex=args.multiplex,
+                           transport="unix" if args.unix_socket else "tcp", unix_socket=args.unix_socket)
+
+    for path in chosen:
+        try:
+            agent_host.add_agent(str(path))
+        except Exception as e:
+            print("skipping {}: {}".format(path, e))
+
+    print("hosting {} agents in one process".format(len(agent_host.agents)))
+    try:
+        agent_host.run()
+    except KeyboardInterrupt:
+        print("<interrupt - shutting down>")
+
+    print("<host done>")
@@ -0,0 +1,143 @@
+import time
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Time from a round's broadcast to the arrival of each agent's bid for it.
+
+    The server calls round_sent() when it broadcasts a round, bid_received() for every bid
+    message and close_round() when the tick settles the round. Only the first bid of an agent
+    for the open round is timed, a bid that names an older round is a late answer to that one
+    and is not timed. A missed round is counted as a miss only, it is no sample, so the
+    percentiles are of the answers that arrived. Agents the round was not sent to, or that
+    disconnected before it closed, are not counted. The last `window` samples and misses of
+    every agent are kept, an agent that missed more than `slow_miss_rate` of its recent rounds
+    is flagged as slow. The flags are updated as a round closes and the stats are computed at
+    most once per closed round.
+    """
+    def __init__(self, window:int=200, slow_miss_rate:float=0.1):
+        self.window = window
+        self.slow_miss_rate = slow_miss_rate
+
+        self._sent_at: Optional[float] = None
+        self._round: Optional[int] = None
+        self._sent_to: Optional[set] = None
+        self._answered = set()
+
+        self._samples: Dict[str, deque] = {}
+        self._missed: Dict[str, deque] = {}     # 1 for a missed round, 0 for an answered one
+        self._recent_missed: Dict[str, int] = {}  # sum of _missed
+        self.total_missed: Dict[str, int] = {}
+        self.slow = set()
+        self._stats: Dict[str, Dict[str, object]] = {}
+
+    def reset(self):
+        self.__init__(window=self.window, slow_miss_rate=self.slow_miss_rate)
+
+    def _agent(self, a_id:str):
+        if a_id not in self._samples:
+            self._samples[a_id] = deque(maxlen=self.window)
+            self._missed[a_id] = deque(maxlen=self.window)
+            self._recent_missed[a_id] = 0
+            self.total_missed[a_id] = 0
+
+    def round_sent(self, round:int=None, agents:Iterable[str]=None, t:float=None):
+        self._sent_at = time.perf_counter() if t is None else t
+        self._round = round
+        self._sent_to = None if agents is None else set(agents)
+        self._answered = set()
+
+    def bid_received(self, a_id:str, round:int=None, t:float=None) -> Optional[float]:
+        """Seconds since the round was sent, None if it is not the first bid of this agent for the open round.
+
+        round is the round the agent answers, None for clients that do not say.
+        """
+        if self._sent_at is None or a_id in self._answered:
+            return None
+        if round is not None and self._round is not None and round != self._round:
+            return None
+
+        t = time.perf_counter() if t is None else t
+        latency = t - self._sent_at
+        self._answered.add(a_id)
+
+        self._agent(a_id)
+        self._samples[a_id].append(latency)
+        return latency
+
+    def close_round(self, expected:Iterable[str]) -> List[str]:
+        """Ends the round that was sent last; returns the expected agents that did not bid in time."""
+        if self._sent_at is None:
+            return []
+
+        missed = []
+        for a_id in expected:
+            if self._sent_to is not None and a_id not in self._sent_to:
+                continue
+            self._agent(a_id)
+            recent = self._missed[a_id]
+            if len(recent) == recent.maxlen:
+                self._recent_missed[a_id] -= recent[0]
+
+            miss = 0 if a_id in self._answered else 1
+            recent.append(miss)
+            self._recent_missed[a_id] += miss
+            if miss:
+                self.total_missed[a_id] += 1
+                missed.append(a_id)
+
+            if self._recent_missed[a_id] / len(recent) > self.slow_miss_rate:
+                self.slow.add(a_id)
+            else:
+                self.slow.discard(a_id)
+
+        self._stats = {}
+        self._sent_at = None
+        self._sent_to = None
+        self._answered = set()
+        return missed
+
+    def is_slow(self, a_id:str) -> bool:
+        return a_id in self.slow
+
+    def agent_stats(self, a_id:str) -> Dict[str, object]:
+        """p50/p99/max of the recent samples and the misses, as of the last closed round."""
+        if a_id not in self._stats:
+            self._stats[a_id] = self._compute_stats(a_id)
+        return dict(self._stats[a_id])
+
+    def _compute_stats(self, a_id:str) -> Dict[str, object]:
+        samples = self._samples.get(a_id)
+        recent_missed = self._missed.get(a_id)
+
+        stats = {"p50_ms": None, "p99_ms": None, "max_ms": None, "samples": 0,
+                 "missed": self.total_missed.get(a_id, 0), "miss_rate": 0.0, "slow": a_id in self.slow}
+
+        if samples:
+            values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+            p50, p99 = np.percentile(values, [50, 99])
+            stats.update(p50_ms=round(float(p50) * 1000, 2), p99_ms=round(float(p99) * 1000, 2),
+                         max_ms=round(float(values.max()) * 1000, 2), samples=len(samples))
+
+        if recent_missed:
+            stats["miss_rate"] = round(self._recent_missed[a_id] / len(recent_missed), 3)
+
+        return stats
+
+    def percentile(self, q:float) -> Optional[float]:
+        """The q-th percentile (seconds) over the recent samples of all agents."""
+        samples = [s for agent_samples in self._samples.values() for s in agent_samples]
+        if not samples:
+            return None
+        return float(np.percentile(np.asarray(samples, dtype=np.float64), q))
+
+    def recommended_tick(self, headroom:float=1.25, minimum:float=0.05) -> Optional[float]:
+        """A tick interval (seconds) that lets the p99 agent answer, rounded up to 10 ms."""
+        p99 = self.percentile(99)
+        if p99 is None:
+            return None
+        return max(minimum, math.ceil(p99 * headroom * 100) / 100)
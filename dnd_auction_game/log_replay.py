@@ -0,0 +1,213 @@
+import io
+import os
+import re
+import json
+import asyncio
+import contextlib
+from typing import Callable, Dict, List, Optional
+
+from dnd_auction_game.auction_house import AuctionHouse
+
+
+_ROUND_PREFIX = re.compile(rb'^\{"round":\s*(\d+)')
+
+# rounds applied before the one sought, enough for the leaderboard's sparklines and averages
+WARMUP_ROUNDS = 20
+
+
+def _round_of(line:bytes) -> int:
+    # the server writes "round" first, the rest of the line is only parsed when the round is played
+    m = _ROUND_PREFIX.match(line)
+    if m is not None:
+        return int(m.group(1))
+    return json.loads(line)["round"]
+
+
+class RoundIndex:
+    """Byte offset of every round in an auction house log (auction_house_log_N.jsonln).
+
+    A log holds one game after the other (the round number starts over), games[g][i] is the
+    offset of round i + first_round[g] of game g. The index is built by scanning for line ends,
+    refresh() picks up the rounds a running server appended since.
+    """
+    def __init__(self, path:str):
+        self.path = path
+        self.games: List[List[int]] = []
+        self.first_round: List[int] = []
+        self._scanned = 0
+        self._last_round = None
+        self.refresh()
+
+    def refresh(self):
+        with open(self.path, "rb") as fp:
+            fp.seek(self._scanned)
+            offset = self._scanned
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    r = _round_of(line)
+                    if self._last_round is None or r != self._last_round + 1:
+                        self.games.append([])
+                        self.first_round.append(r)
+                    self.games[-1].append(offset)
+                    self._last_round = r
+                offset += len(line)
+        self._scanned = offset
+
+    def rounds(self, game:int) -> range:
+        return range(self.first_round[game], self.first_round[game] + len(self.games[game]))
+
+    def read(self, game:int, round:int) -> bytes:
+        with open(self.path, "rb") as fp:
+            fp.seek(self.games[game][round - self.first_round[game]])
+            return fp.readline()
+
+
+def _load_names(log_file:str) -> Dict[str, str]:
+    """a_id -> name from the player id log the server writes next to the auction log."""
+    path = os.path.join(os.path.dirname(log_file), os.path.basename(log_file).replace("auction_house_log_", "auction_house_log_player_id_", 1))
+    names = {}
+    if path != log_file and os.path.isfile(path):
+        with open(path) as fp:
+            for line in fp:
+                try:
+                    info = json.loads(line)
+                    names[info["agent_id"]] = info["name"]
+                except Exception:
+                    continue
+    return names
+
+
+class LogReplay:
+    """Plays a recorded game into an AuctionHouse that only serves the leaderboard, at a chosen speed.
+
+    speed 1.0 plays a round every `tick_interval` seconds like the live game, 10.0 ten times as
+    fast, 0 as fast as the rounds can be read. on_round(raw_line) is called after every round.
+    The house carries the tokens of the live game, the server's token checks keep working.
+    """
+    def __init__(self, path:str, game_token:str, play_token:str, game:int=-1, tick_interval:float=1.0,
+                 on_round:Callable=None):
+        self.path = path
+        self.game_token = game_token
+        self.play_token = play_token
+        self.index = RoundIndex(path)
+        if not self.index.games:
+            raise ValueError("no rounds in '{}'".format(path))
+
+        self.game = game if game >= 0 else len(self.index.games) + game
+        if not 0 <= self.game < len(self.index.games):
+            raise ValueError("no game {} in '{}' ({} games)".format(game, path, len(self.index.games)))
+
+        self.tick_interval = tick_interval
+        self.on_round = on_round
+        self.speed = 1.0
+        self.names = _load_names(path)
+        self.house: Optional[AuctionHouse] = None
+        self.next_round = self.index.first_round[self.game]
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def rounds(self) -> range:
+        return self.index.rounds(self.game)
+
+    def _new_house(self, first:dict) -> AuctionHouse:
+        with contextlib.redirect_stdout(io.StringIO()):
+            house = AuctionHouse(game_token=self.game_token, play_token=self.play_token, save_logs=False, seed=0)
+        house.log_player_id_file = os.devnull
+
+        # the schedules of the whole game, from the first round the log has
+        skipped = first["round"]
+        house.gold_income_per_round = [first["remainder_gold_income"][0]] * skipped + first["remainder_gold_income"]
+        house.bank_limit_per_round = [first["remainder_bank_limit"][0]] * skipped + first["remainder_bank_limit"]
+        house.bank_interest_per_round = [first["remainder_bank_interest"][0]] * skipped + first["remainder_bank_interest"]
+        house.num_rounds_in_game = len(house.gold_income_per_round)
+        return house
+
+    def _apply(self, round_data:dict):
+        """Moves the house to the state the round was sent out with, as prepare_auctions_and_pool left it."""
+        house = self.house
+        for a_id, state in round_data["states"].items():
+            if a_id not in house.agents:
+                house.names[a_id] = self.names.get(a_id, a_id)
+                house.rank_index.add(a_id, state["points"])
+                house.points_history.add_agent(a_id, state["points"])
+                house.series.add_agent(a_id)
+            house.agents[a_id] = state
+            house.rank_index.update(a_id, state["points"])
+
+        house.rank_movers = house.rank_index.settle()
+        house.points_history.record(house.agents)
+        house.series.record(house.agents)
+
+        house.current_auctions = round_data["auctions"]
+        house.gold_in_pool = round_data["pool"]
+        house.round_counter = round_data["round"] + 1
+        house.is_done = house.round_counter >= house.num_rounds_in_game
+
+    def _read(self, round:int):
+        raw = self.index.read(self.game, round)
+        return raw, json.loads(raw)
+
+    def current_round(self) -> bytes:
+        """The raw line of the round last played."""
+        return self.index.read(self.game, self.next_round - 1)
+
+    def seek(self, round:int) -> int:
+        """Rebuilds the state at `round` from the few rounds before it, the next round played is the one after."""
+        rounds = self.rounds
+        round = min(max(round, rounds.start), rounds.stop - 1)
+
+        first = json.loads(self.index.read(self.game, rounds.start))
+        self.house = self._new_house(first)
+        for r in range(max(rounds.start, round - WARMUP_ROUNDS), round + 1):
+            self._apply(self._read(r)[1])
+
+        self.next_round = round + 1
+        return round
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "log": self.path,
+            "game": self.game,
+            "games": len(self.index.games),
+            "first_round": self.rounds.start,
+            "last_round": self.rounds.stop - 1,
+            "round": self.next_round - 1,
+            "speed": self.speed,
+            "playing": self._task is not None and not self._task.done(),
+        }
+
+    def start(self, speed:float=1.0):
+        self.speed = max(0.0, speed)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            if self.next_round >= self.rounds.stop:
+                # the server may still be writing the game
+                await asyncio.to_thread(self.index.refresh)
+                if self.next_round >= self.rounds.stop:
+                    return
+
+            # read and parse off the event loop, applied on it (the leaderboard reads the house)
+            raw, round_data = await asyncio.to_thread(self._read, self.next_round)
+            self._apply(round_data)
+            self.next_round += 1
+            if self.on_round is not None:
+                self.on_round(raw)
+
+            delay = 0.0 if self.speed <= 0 else self.tick_interval / self.speed - (loop.time() - t)
+            await asyncio.sleep(max(0.0, delay))
@@ -0,0 +1,173 @@
+import time
+import math
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+# seconds, from a fast tick phase to a broadcast that hits its timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value:float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value:str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names:Tuple[str, ...], values:Tuple[str, ...], extra:str="") -> str:
+    parts = ["{}=\"{}\"".format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    if not parts:
+        return ""
+    return "{" + ",".join(parts) + "}"
+
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text exposition format."""
+    def __init__(self):
+        self.metrics: List["_Metric"] = []
+
+    def register(self, metric:"_Metric"):
+        if any(m.name == metric.name for m in self.metrics):
+            raise ValueError("metric already registered: '{}'".format(metric.name))
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation.replace("\n", " ")))
+            lines.append("# TYPE {} {}".format(metric.name, metric.type))
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name:str, documentation:str, labelnames:Tuple[str, ...]=(), registry:Registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels:Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError("{} expects labels {}, got {}".format(self.name, self.labelnames, tuple(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name:str, documentation:str, labelnames:Tuple[str, ...]=(), registry:Registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount:float=1, **labels):
+        if amount < 0:
+            raise ValueError("counters only go up")
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return ["{}{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(value))
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name:str, documentation:str, labelnames:Tuple[str, ...]=(), registry:Registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = None
+
+    def set(self, value:float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount:float=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount:float=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Reads the value from function() at scrape time (unlabelled gauges only)."""
+        self._function = function
+
+    def get(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return ["{} {}".format(self.name, _format_value(self._function()))]
+        return ["{}{} {}".format(self.name, _format_labels(self.labelnames, key), _format_value(value))
+                for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name:str, documentation:str, labelnames:Tuple[str, ...]=(), buckets=DEFAULT_BUCKETS,
+                 registry:Registry=REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        # per label set: [count per bucket (not cumulative) + the +Inf bucket, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value:float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in the with-block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = "le=\"{}\"".format(_format_value(bound))
+                lines.append("{}_bucket{} {}".format(self.name, _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            lines.append("{}_sum{} {}".format(self.name, labels, _format_value(total)))
+            lines.append("{}_count{} {}".format(self.name, labels, cumulative))
+        return lines
@@ -0,0 +1,259 @@
+import os
+import glob
+import json
+import time
+import pickle
+import asyncio
+import threading
+from typing import Dict, Optional
+
+from dnd_auction_game.history import SeriesStore
+from dnd_auction_game.log_replay import RoundIndex
+
+
+# not part of a snapshot: the tokens come from the environment of the restarted server, the store reattaches itself,
+# the series (every round of every agent, grows through the game) is read back from the auction log
+_NOT_SAVED = ("journal", "game_token", "play_token", "series")
+
+
+def replay_entry(house, entry:dict):
+    """Applies one journal entry to the house, the way the server applied it when the game was played.
+
+    Returns the ledger digest the journal recorded for a tick and the one the replay produced, None otherwise.
+    """
+    t = entry["t"]
+    if t == "bid":
+        house.register_bid(entry["a_id"], entry["auction_id"], entry["gold"])
+    elif t == "pool":
+        house.register_pool_buy(entry["a_id"], entry["points"])
+    elif t == "join":
+        house.add_agent(entry["name"], entry["a_id"], entry["player_id"])
+    elif t == "start":
+        house.start_game(entry["num_rounds"])
+    elif t == "tick":
+        # one round of server_tick: settle the pool, settle the bids, send out the next round
+        house.process_pool_buys()
+        house.process_all_bids()
+        house.prepare_auctions_and_pool()
+        if house.round_counter >= house.num_rounds_in_game:
+            house.is_active = False
+            house.is_done = True
+        return entry["digest"], house.ledger_digest()
+    return None
+
+
+def rebuild_series(house, rounds:int) -> SeriesStore:
+    """The gold and points of the game's first `rounds` rounds, read back from the house's auction log.
+
+    Without a log that holds them the series of every agent starts at `rounds`.
+    """
+    series = SeriesStore(round_capacity=max(1024, 2 * rounds))
+    try:
+        if rounds > 0:
+            index = RoundIndex(house.log_file)
+            game = len(index.games) - 1
+            if game < 0 or index.first_round[game] != 0 or len(index.games[game]) < rounds:
+                raise ValueError("the log does not hold the first {} rounds of the game".format(rounds))
+
+            for r in range(rounds):
+                states = json.loads(index.read(game, r))["states"]
+                for a_id in states:
+                    series.add_agent(a_id)
+                series.record(states)
+    except Exception as e:
+        print("<WARNING: history before round {} not restored: {}>".format(rounds, e))
+        series = SeriesStore(round_capacity=max(1024, 2 * rounds))
+        series.length = rounds
+
+    for a_id in house.agents:
+        series.add_agent(a_id)
+    return series
+
+
+def read_journal(path:str, offset:int=0):
+    """The entries from offset on and the offset after the last complete line (a crash can leave half a line)."""
+    entries = []
+    with open(path, "rb") as fp:
+        fp.seek(offset)
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break
+            entries.append(json.loads(line))
+            offset += len(line)
+    return entries, offset
+
+
+class Journal:
+    """Append-only JSON lines, buffered in memory until flush()."""
+    def __init__(self, path:str, mode:str="wb"):
+        self.path = path
+        self._fp = open(path, mode)
+        self._buffer = []
+
+    def write(self, entry:dict):
+        self._buffer.append(json.dumps(entry, separators=(",", ":")))
+
+    def flush(self):
+        if not self._buffer:
+            return
+        self._fp.write("".join(line + "\n" for line in self._buffer).encode("utf-8"))
+        self._fp.flush()
+        self._buffer = []
+
+    def tell(self) -> int:
+        self.flush()
+        return self._fp.tell()
+
+    def truncate(self, size:int):
+        self.flush()
+        self._fp.truncate(size)
+        self._fp.seek(0, os.SEEK_END)
+
+    def close(self):
+        self.flush()
+        self._fp.close()
+
+
+class StateStore:
+    """Crash recovery for the AuctionHouse, kept in one directory (AH_STATE_DIR).
+
+    Every game has an append-only journal, game_<seed>.journal.jsonl: the seed, joins, the start,
+    accepted bids, pool buys and a SHA-256 digest of the ledger after every round. Every `snapshot_every`
+    rounds the whole house is pickled to game_<seed>.snapshot together with the journal offset it
+    covers. restore() loads the newest snapshot and replays the journal after it, which gives the
+    exact state: every random draw comes from the house's own seeded generator.
+    """
+    def __init__(self, directory:str, snapshot_every:int=50):
+        self.directory = directory
+        self.snapshot_every = max(1, snapshot_every)
+        self.seed = None
+        self._journal: Optional[Journal] = None
+        self._write_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def journal_path(self, seed:int) -> str:
+        return os.path.join(self.directory, "game_{}.journal.jsonl".format(seed))
+
+    def snapshot_path(self, seed:int) -> str:
+        return os.path.join(self.directory, "game_{}.snapshot".format(seed))
+
+    def write(self, entry:dict):
+        self._journal.write(entry)
+
+    def flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def attach(self, house):
+        """Journals the house from now on, the house is at the start of a game."""
+        house.journal = self
+        self.new_game(house)
+        self.snapshot(house)
+
+    def new_game(self, house):
+        """Called by AuctionHouse.reset(), the next game gets its own journal.
+
+        restore() starts from the newest snapshot, the caller snapshots the new game (see snapshot_async).
+        """
+        self.close()
+        self.seed = house.seed
+        self._journal = Journal(self.journal_path(house.seed))
+        self.write({"t": "game", "seed": house.seed})
+
+    def _pickle(self, house) -> bytes:
+        # pickled right away, the house changes as soon as the event loop moves on
+        state = {k: v for k, v in house.__dict__.items() if k not in _NOT_SAVED}
+        state["series_length"] = house.series.length
+        data = {"seed": house.seed, "offset": self._journal.tell() if self._journal is not None else 0, "state": state}
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _write(self, path:str, blob:bytes):
+        tmp = path + ".tmp"
+        try:
+            with self._write_lock:
+                with open(tmp, "wb") as fp:
+                    fp.write(blob)
+                os.replace(tmp, path)
+        except Exception as e:
+            print("error writing snapshot:", e)
+
+    def snapshot(self, house):
+        self._write(self.snapshot_path(house.seed), self._pickle(house))
+
+    async def snapshot_async(self, house):
+        """The snapshot, written to disk off the event loop."""
+        await asyncio.to_thread(self._write, self.snapshot_path(house.seed), self._pickle(house))
+
+    async def round_settled(self, house):
+        if house.is_done or house.round_counter % self.snapshot_every == 0:
+            await self.snapshot_async(house)
+
+    def _newest_snapshot(self) -> Optional[str]:
+        paths = glob.glob(os.path.join(self.directory, "game_*.snapshot"))
+        if not paths:
+            return None
+        return max(paths, key=os.path.getmtime)
+
+    def restore(self, house) -> Optional[Dict[str, object]]:
+        """Puts the house back in the state of the last game the store journaled and keeps journaling it.
+
+        Returns None (the house is untouched) when there is nothing to restore.
+        """
+        path = self._newest_snapshot()
+        if path is None:
+            return None
+
+        t = time.perf_counter()
+        try:
+            with open(path, "rb") as fp:
+                data = pickle.load(fp)
+        except Exception as e:
+            print("error reading snapshot '{}': {}".format(path, e))
+            return None
+
+        journal_path = self.journal_path(data["seed"])
+        entries, end = [], data["offset"]
+        if os.path.isfile(journal_path):
+            entries, end = read_journal(journal_path, data["offset"])
+
+        state = dict(data["state"])
+        series_length = state.pop("series_length", 0)
+        house.__dict__.update(state)
+        house.series = rebuild_series(house, series_length)
+
+        # replayed entries are already in the journal and on disk in the logs
+        house.journal = None
+        save_logs, log_player_id_file = house.save_logs, house.log_player_id_file
+        house.save_logs, house.log_player_id_file = False, os.devnull
+
+        mismatches = 0
+        for entry in entries:
+            digests = replay_entry(house, entry)
+            if digests is not None and digests[0] != digests[1]:
+                mismatches += 1
+                print("<WARNING: round {} does not match the journal>".format(house.round_counter))
+
+        house.save_logs, house.log_player_id_file = save_logs, log_player_id_file
+
+        self.close()
+        self.seed = data["seed"]
+        self._journal = Journal(journal_path, "ab")
+        # drop a half written last line
+        self._journal.truncate(end)
+        house.journal = self
+
+        result = {
+            "seed": data["seed"],
+            "round": house.round_counter,
+            "agents": len(house.agents),
+            "replayed": len(entries),
+            "mismatches": mismatches,
+            "ms": round((time.perf_counter() - t) * 1000, 2),
+        }
+        print("restored game {seed} at round {round} ({agents} agents, {replayed} journal entries) in {ms} ms".format(**result))
+        return result
@@ -1,4 +1,5 @@
 import sys
+import os
 import random
 import asyncio
 import json
@@ -6,9 +7,11 @@ import websockets
 
 
 class AuctionGameRunner:
-    def __init__(self, host:str, play_token:str, n_rounds=5, time_per_round:float=1.0, port:int=8000):
+    def __init__(self, host:str, play_token:str, n_rounds=5, time_per_round:float=1.0, port:int=8000,
+                 unix_socket:str=None):
         self.host = host
         self.port = port
+        self.unix_socket = unix_socket
         self.n_rounds = n_rounds
         self.play_token = play_token
         
@@ -20,10 +23,15 @@ class AuctionGameRunner:
         
     async def _internal_run(self):
         connection_str = "ws://{}:{}/ws_run/{}".format(self.host, self.port, self.play_token)
-        print("connecting to: {}".format(connection_str))
-        
 
-        async with websockets.connect(connection_str) as sock:
+        if self.unix_socket is not None:
+            print("connecting to: {} on unix socket {}".format(connection_str, self.unix_socket))
+            connection = websockets.unix_connect(self.unix_socket, connection_str)
+        else:
+            print("connecting to: {}".format(connection_str))
+            connection = websockets.connect(connection_str)
+
+        async with connection as sock:
             print("<connected - starting game>")
 
             game_info = {"num_rounds": self.n_rounds}
@@ -50,7 +58,10 @@ if __name__ == "__main__":
     else:
         play_token = "play123"
         
-    runner = AuctionGameRunner(host, n_rounds=n_rounds, play_token=play_token)
+    # AH_UNIX_SOCKET: talk to a server started with 'uvicorn dnd_auction_game.server:app --uds <path>'
+    unix_socket = os.environ.get("AH_UNIX_SOCKET") or None
+
+    runner = AuctionGameRunner(host, n_rounds=n_rounds, play_token=play_token, unix_socket=unix_socket)
     print("Running the game for: {} rounds.".format(n_rounds))
     runner.run()
     
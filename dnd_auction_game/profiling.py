@@ -0,0 +1,171 @@
+import io
+import sys
+import time
+import marshal
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional
+
+
+class TickProfiler:
+    """Profiles the next N server ticks of a running server, started and read over HTTP.
+
+    mode "cprofile": cProfile is enabled from the start to the end of every tick (the coroutines
+    that run while the tick awaits are included), the result is pstats text or a .prof file.
+    mode "sample": a thread samples the event loop thread's stack every `interval` seconds from
+    the first to the last profiled tick, sleeps included, the result is collapsed stacks
+    ("frame;frame;frame count") for flamegraph.pl / speedscope.
+    """
+    def __init__(self):
+        self.mode: Optional[str] = None
+        self.ticks_wanted = 0
+        self.ticks_done = 0
+        self.active = False
+        self.started_at = None
+        self.finished_at = None
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: Counter = Counter()
+        self._stacks_lock = threading.Lock()
+        self._samples = 0
+        self._interval = 0.005
+        self._sampler: Optional[threading.Thread] = None
+        self._target_thread = None
+        self._stop_sampling = threading.Event()
+
+    def start(self, mode:str="cprofile", ticks:int=10, interval:float=0.005):
+        if mode not in ("cprofile", "sample"):
+            raise ValueError("unknown profile mode: '{}'".format(mode))
+        if self.active:
+            self.stop()
+
+        self.__init__()
+        self.mode = mode
+        self.ticks_wanted = max(1, ticks)
+        self._interval = max(0.0005, interval)
+        self.active = True
+        self.started_at = time.time()
+        # the caller runs on the event loop thread, which is where server_tick runs
+        self._target_thread = threading.get_ident()
+
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+
+    def tick_started(self):
+        if not self.active:
+            return
+        if self.mode == "cprofile":
+            self._profile.enable()
+        elif self._sampler is None:
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="tick-profiler", daemon=True)
+            self._sampler.start()
+
+    def tick_finished(self):
+        if not self.active:
+            return
+        if self.mode == "cprofile":
+            self._profile.disable()
+
+        self.ticks_done += 1
+        if self.ticks_done >= self.ticks_wanted:
+            self.stop()
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self.finished_at = time.time()
+
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+
+    def _sample_loop(self):
+        while not self._stop_sampling.wait(self._interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            with self._stacks_lock:
+                self._stacks[";".join(reversed(stack))] += 1
+                self._samples += 1
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "active": self.active,
+            "ticks_wanted": self.ticks_wanted,
+            "ticks_done": self.ticks_done,
+            "samples": self._samples,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def pstats_text(self, sort:str="cumulative", limit:int=50) -> str:
+        if self._profile is None:
+            return ""
+        out = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def prof_bytes(self) -> bytes:
+        """The profile in the format pstats.Stats(path) / snakeviz load."""
+        if self._profile is None:
+            return b""
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+    def collapsed(self) -> str:
+        with self._stacks_lock:
+            stacks = self._stacks.most_common()
+        return "".join("{} {}\n".format(stack, count) for stack, count in stacks)
+
+
+class MemoryTracer:
+    """tracemalloc snapshots of the running server, each diffed against the one before."""
+    def __init__(self):
+        self._last: Optional[tracemalloc.Snapshot] = None
+
+    @staticmethod
+    def _format(stats, limit:int):
+        return [str(stat) for stat in stats[:limit]]
+
+    def snapshot(self, limit:int=30, frames:int=1) -> Dict[str, object]:
+        """Starts tracing on the first call (nothing is known about earlier allocations)."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._last = None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+
+        result = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": self._format(snapshot.statistics("lineno"), limit),
+        }
+        if self._last is not None:
+            result["diff"] = self._format(snapshot.compare_to(self._last, "lineno"), limit)
+        self._last = snapshot
+        return result
+
+    def stop(self):
+        self._last = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,106 @@
+from typing import List, Dict, Tuple
+from bisect import bisect_left, bisect_right
+
+
+# sorts after every real key, used as the "old position" of an agent that just joined
+_BOTTOM = (float("inf"), float("inf"))
+
+
+class RankIndex:
+    """Agents ordered by points, highest first, ties in join order (the leaderboard order).
+
+    Keys are kept in a sorted list, so rank-of and top-k are a bisect / a slice. Moving an
+    agent is a bisect plus a list delete and insert: O(n) element moves (a memmove, ~20 us at
+    10k agents, ~150 us at 100k) but no sort of the lobby. The rank movers of a round are found
+    by looking at the agents whose key lies between the old and new key of a changed agent: an
+    agent outside all those ranges has exactly the same agents above it as before.
+    """
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []   # sorted (-points, join_seq)
+        self._ids: List[str] = []                # a_id for the key at the same position
+        self._key_of: Dict[str, Tuple[int, int]] = {}
+        self._seq = 0
+
+        self._ranks: Dict[str, int] = {}         # rank of every agent as of the last settle()
+        self._dirty: List[Tuple[Tuple, Tuple]] = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, a_id:str):
+        return a_id in self._key_of
+
+    def _insert(self, a_id:str, key:Tuple[int, int]):
+        pos = bisect_left(self._keys, key)
+        self._keys.insert(pos, key)
+        self._ids.insert(pos, a_id)
+        self._key_of[a_id] = key
+
+    def _remove(self, key:Tuple[int, int]):
+        pos = bisect_left(self._keys, key)
+        del self._keys[pos]
+        del self._ids[pos]
+
+    def add(self, a_id:str, points:int=0):
+        if a_id in self._key_of:
+            self.update(a_id, points)
+            return
+
+        key = (-points, self._seq)
+        self._seq += 1
+        self._insert(a_id, key)
+        self._dirty.append((key, _BOTTOM))
+
+    def update(self, a_id:str, points:int):
+        old_key = self._key_of[a_id]
+        if old_key[0] == -points:
+            return
+
+        new_key = (-points, old_key[1])
+        self._remove(old_key)
+        self._insert(a_id, new_key)
+        self._dirty.append((min(old_key, new_key), max(old_key, new_key)))
+
+    def rank_of(self, a_id:str) -> int:
+        """1-based rank."""
+        return bisect_left(self._keys, self._key_of[a_id]) + 1
+
+    def top(self, k:int) -> List[str]:
+        return self._ids[:k]
+
+    def ids(self) -> List[str]:
+        """All agents in rank order (do not modify)."""
+        return self._ids
+
+    def settle(self) -> Dict[str, int]:
+        """Ranks changed since the last settle: a_id -> +1 (moved up) or -1 (moved down).
+
+        Agents seen for the first time get a rank but are not reported as movers.
+        """
+        if not self._dirty:
+            return {}
+
+        # merge the key ranges touched since the last settle
+        self._dirty.sort()
+        merged = []
+        for low, high in self._dirty:
+            if merged and low <= merged[-1][1]:
+                if high > merged[-1][1]:
+                    merged[-1][1] = high
+            else:
+                merged.append([low, high])
+        self._dirty = []
+
+        movers = {}
+        for low, high in merged:
+            start = bisect_left(self._keys, low)
+            end = bisect_right(self._keys, high)
+            for pos in range(start, end):
+                a_id = self._ids[pos]
+                rank = pos + 1
+                prev_rank = self._ranks.get(a_id)
+                if prev_rank is not None and prev_rank != rank:
+                    movers[a_id] = 1 if rank < prev_rank else -1
+                self._ranks[a_id] = rank
+
+        return movers
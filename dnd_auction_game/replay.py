@@ -0,0 +1,229 @@
+"""Replays recorded games (the journals AH_STATE_DIR keeps) through AuctionHouse and checks every round's ledger.
+
+    python -m dnd_auction_game.replay verify state/*.journal.jsonl --out replay.json
+    python -m dnd_auction_game.replay verify games/ --baseline replay.json
+    python -m dnd_auction_game.replay record games/ --games 10000 --agents 20 --rounds 100
+
+verify is the regression check for changes to the settlement (process_all_bids, process_pool_buys):
+any round whose ledger digest differs from the recorded one is a mismatch, and against the --out of an
+earlier run it reports the speedup of the settlement. record writes synthetic games to verify.
+"""
+import io
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import contextlib
+import multiprocessing
+from typing import Dict, List, Optional
+
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.persistence import Journal, replay_entry, read_journal
+
+
+def _new_house(seed:int) -> AuctionHouse:
+    # the engine prints on construction and on joins
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="replay", play_token="replay", save_logs=False, seed=seed)
+    house.log_player_id_file = os.devnull
+    return house
+
+
+def replay_game(path:str) -> Dict[str, object]:
+    """Plays one journal from its first entry, the settle time is the time spent in the recorded rounds."""
+    t = time.perf_counter()
+    result = {"path": path, "rounds": 0, "mismatches": 0, "first_mismatch": None, "settle_s": 0.0, "error": None}
+    try:
+        entries, _ = read_journal(path)
+        if not entries or entries[0]["t"] != "game":
+            raise ValueError("not a game journal")
+
+        house = _new_house(entries[0]["seed"])
+        clock = time.perf_counter
+        with contextlib.redirect_stdout(io.StringIO()):
+            for entry in entries[1:]:
+                if entry["t"] != "tick":
+                    replay_entry(house, entry)
+                    continue
+
+                t_tick = clock()
+                recorded, replayed = replay_entry(house, entry)
+                result["settle_s"] += clock() - t_tick
+                result["rounds"] += 1
+                if recorded != replayed:
+                    result["mismatches"] += 1
+                    if result["first_mismatch"] is None:
+                        result["first_mismatch"] = entry["round"]
+
+    except Exception as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+
+    result["total_s"] = time.perf_counter() - t
+    return result
+
+
+def find_journals(paths:List[str]) -> List[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, "*.journal.jsonl"))))
+        else:
+            found.extend(sorted(glob.glob(path)))
+    return found
+
+
+def verify(paths:List[str], processes:Optional[int]=None) -> List[Dict[str, object]]:
+    if processes == 1 or len(paths) < 2:
+        return [replay_game(path) for path in paths]
+
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap_unordered(replay_game, paths, chunksize=max(1, len(paths) // (8 * (processes or os.cpu_count() or 1)))))
+
+
+def summarize(results:List[Dict[str, object]], wall_s:float, baseline:Optional[dict]=None) -> Dict[str, object]:
+    games = len(results)
+    rounds = sum(r["rounds"] for r in results)
+    settle_s = sum(r["settle_s"] for r in results)
+    summary = {
+        "games": games,
+        "rounds": rounds,
+        "errors": sum(1 for r in results if r["error"]),
+        "mismatched_games": sum(1 for r in results if r["mismatches"] or r["error"]),
+        "mismatched_rounds": sum(r["mismatches"] for r in results),
+        "game_mismatch_rate": sum(1 for r in results if r["mismatches"] or r["error"]) / max(1, games),
+        "round_mismatch_rate": sum(r["mismatches"] for r in results) / max(1, rounds),
+        "settle_s": settle_s,
+        "settle_per_round_s": settle_s / max(1, rounds),
+        "wall_s": wall_s,
+        "rounds_per_s": rounds / wall_s if wall_s > 0 else 0.0,
+    }
+
+    if baseline is not None:
+        # only the games both runs replayed, by file name
+        before = {os.path.basename(r["path"]): r for r in baseline["results"] if not r["error"]}
+        pairs = [(before[os.path.basename(r["path"])], r) for r in results
+                 if not r["error"] and os.path.basename(r["path"]) in before]
+        base_s = sum(b["settle_s"] for b, _ in pairs)
+        cur_s = sum(r["settle_s"] for _, r in pairs)
+        summary["baseline_games"] = len(pairs)
+        summary["speedup"] = base_s / cur_s if cur_s > 0 else None
+    return summary
+
+
+def print_summary(summary:Dict[str, object], results:List[Dict[str, object]]):
+    for r in sorted(results, key=lambda r: r["path"]):
+        if r["error"]:
+            print("ERROR     {}  {}".format(r["path"], r["error"]))
+        elif r["mismatches"]:
+            print("MISMATCH  {}  {} of {} rounds, first at round {}".format(r["path"], r["mismatches"], r["rounds"], r["first_mismatch"]))
+
+    print("{games} games, {rounds} rounds replayed in {wall_s:.2f} s ({rounds_per_s:.0f} rounds/s)".format(**summary))
+    print("mismatches: {mismatched_games} games ({game_mismatch_rate:.2%}), {mismatched_rounds} rounds ({round_mismatch_rate:.4%})".format(**summary))
+    print("settle: {:.1f} us per round".format(summary["settle_per_round_s"] * 1e6))
+    if "speedup" in summary:
+        if summary["speedup"] is None:
+            print("speedup: no games in common with the baseline")
+        else:
+            print("speedup: x{:.2f} over the baseline ({} games)".format(summary["speedup"], summary["baseline_games"]))
+
+
+def record_game(directory:str, seed:int, n_agents:int, n_rounds:int) -> str:
+    """Plays a game of random bidders the way server_tick does and journals it."""
+    house = _new_house(seed)
+    journal = Journal(os.path.join(directory, "game_{}.journal.jsonl".format(seed)))
+    house.journal = journal
+    journal.write({"t": "game", "seed": seed})
+
+    rng = random.Random(seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n_agents):
+            house.add_agent("agent_{}".format(i), "agent_{}".format(i), "replay")
+        house.start_game(n_rounds)
+
+        while not house.is_done:
+            house.process_pool_buys()
+            house.process_all_bids()
+            house.prepare_auctions_and_pool()
+            if house.round_counter >= house.num_rounds_in_game:
+                house.is_active = False
+                house.is_done = True
+                break
+
+            auction_ids = list(house.current_auctions)
+            for a_id, agent in house.agents.items():
+                # round numbers tie often, which exercises the priority swap
+                for auction_id in rng.sample(auction_ids, min(2, len(auction_ids))):
+                    house.register_bid(a_id, auction_id, rng.choice([10, 50, 100, rng.randint(1, max(1, agent["gold"] // 4))]))
+                if agent["points"] > 0 and rng.random() < 0.1:
+                    house.register_pool_buy(a_id, rng.randint(1, agent["points"]))
+
+    journal.close()
+    return journal.path
+
+
+def _record_one(args):
+    return record_game(*args)
+
+
+def cmd_verify(args):
+    paths = find_journals(args.paths)
+    if not paths:
+        print("<ERROR: no journals found>")
+        return 1
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+
+    t = time.perf_counter()
+    results = verify(paths, args.processes)
+    summary = summarize(results, time.perf_counter() - t, baseline)
+    print_summary(summary, results)
+
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump({"summary": summary, "results": results}, fp, indent=1)
+        print("results written to: '{}'".format(args.out))
+
+    return 1 if summary["mismatched_games"] else 0
+
+
+def cmd_record(args):
+    os.makedirs(args.directory, exist_ok=True)
+    jobs = [(args.directory, args.seed + i, args.agents, args.rounds) for i in range(args.games)]
+
+    t = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        for _ in pool.imap_unordered(_record_one, jobs, chunksize=max(1, len(jobs) // 64)):
+            pass
+    print("recorded {} games in {:.1f} s to '{}'".format(len(jobs), time.perf_counter() - t, args.directory))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded games and verify the ledger of every round.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = sub.add_parser("verify", help="replay journals and compare every round with the recording")
+    verify_parser.add_argument("paths", nargs="+", help="journal files, globs or directories")
+    verify_parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    verify_parser.add_argument("--baseline", default=None, help="--out of an earlier run, reports the speedup against it")
+    verify_parser.add_argument("--out", default=None, help="write the per game results as JSON")
+
+    record_parser = sub.add_parser("record", help="journal games of random bidders")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("--games", type=int, default=100)
+    record_parser.add_argument("--agents", type=int, default=20)
+    record_parser.add_argument("--rounds", type=int, default=100)
+    record_parser.add_argument("--seed", type=int, default=1)
+    record_parser.add_argument("--processes", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "verify":
+        sys.exit(cmd_verify(args))
+    else:
+        sys.exit(cmd_record(args))
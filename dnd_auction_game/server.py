@@ -1,51 +1,361 @@
 import random
 import math
 import os
+import gzip
+import time
 import asyncio
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional
 from collections import defaultdict
 import json
+import re
 from contextlib import asynccontextmanager
 import threading
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-from fastapi.responses import HTMLResponse
+from fastapi.responses import Response, PlainTextResponse
 from fastapi import (
     FastAPI,
+    Query,
+    Request,
     WebSocket,
     WebSocketDisconnect,
 )
 
-from dnd_auction_game.connection_manager import ConnectionManager
+from dnd_auction_game.connection_manager import ConnectionManager, SpectatorChannel
 from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.history import SERIES_FIELDS, downsample_lttb, downsample_minmax
+from dnd_auction_game.latency import LatencyTracker
+from dnd_auction_game.profiling import TickProfiler, MemoryTracer
+from dnd_auction_game.tracing import tracer, configure as configure_tracing
+from dnd_auction_game.persistence import StateStore
+from dnd_auction_game.log_replay import LogReplay
+from dnd_auction_game.views import STATE_VIEWS, CompactView
 from dnd_auction_game.leadboard import generate_leadboard   
+from dnd_auction_game.transport import register_local_endpoint
+from dnd_auction_game import metrics
 
 
 game_token = os.environ.get("AH_GAME_TOKEN", "play123")
 play_token = os.environ.get("AH_PLAY_TOKEN", "play123")
 auction_house = AuctionHouse(game_token=game_token, play_token=play_token, save_logs=True)
 connection_manager = ConnectionManager()
+leadboard_viewers = ConnectionManager()
+# read-only round feed (/ws_spectate), a spectator more than AH_SPECTATOR_QUEUE rounds behind loses the oldest
+spectators = SpectatorChannel(queue_size=int(os.environ.get("AH_SPECTATOR_QUEUE", "2")))
+
+# seconds between rounds, i.e. the time agents have to answer a round (see /api/latency for a measured value)
+TICK_INTERVAL = float(os.environ.get("AH_TICK_INTERVAL", "1.0"))
+
+latency_tracker = LatencyTracker()
+
+# AH_STATE_VIEW=compact sends each agent its own state, the AH_VIEW_TOP_K leaders and aggregates instead of
+# every agent's state, the full states stay available from /api/states
+STATE_VIEW = os.environ.get("AH_STATE_VIEW", "full")
+if STATE_VIEW not in STATE_VIEWS:
+    print("unknown AH_STATE_VIEW '{}', using 'full'".format(STATE_VIEW))
+    STATE_VIEW = "full"
+VIEW_TOP_K = int(os.environ.get("AH_VIEW_TOP_K", "10"))
+# the states as the last round was sent (/api/states), the live ledger would show the bids of the open round
+_round_states: Dict[str, object] = {"round": None, "states": {}}
+
+# on-demand profiling of the running server, see /debug/...
+tick_profiler = TickProfiler()
+memory_tracer = MemoryTracer()
+
+# AH_TRACE_FILE=trace.json writes a span tree per round, open it in ui.perfetto.dev
+configure_tracing(os.environ.get("AH_TRACE_FILE"))
+
+# AH_STATE_DIR=state/ journals the game and snapshots it every AH_SNAPSHOT_EVERY rounds, a restarted server continues it
+state_store: Optional[StateStore] = None
+if os.environ.get("AH_STATE_DIR"):
+    state_store = StateStore(os.environ["AH_STATE_DIR"], snapshot_every=int(os.environ.get("AH_SNAPSHOT_EVERY", "50")))
+
+# a recorded game played to the leaderboard viewers (see /replay/...), the live game waits in _live_state meanwhile
+log_replay: Optional[LogReplay] = None
+_live_state: Optional[Dict[str, object]] = None
 
-_previous_ranks: Dict[str, int] = {}
 _rank_signals: Dict[str, Dict[str, int]] = {}
-_last_rank_round: int = -1
 _reset_lock = threading.Lock()
+_new_game_snapshot_task = None
+
+# the leaderboard only changes when a round settles, a player joins or the game is started/reset,
+# every change bumps the version and the state (and its serialized forms) is rebuilt once per version
+_leadboard_version: int = 0
+_leadboard_cache: Dict[str, object] = {"version": -1}
+
+# above this many players viewers are pushed the header only and fetch the rows they look at from /api/leadboard
+LEADBOARD_PUSH_MAX_PLAYERS = int(os.environ.get("AH_LEADBOARD_PUSH_MAX", "500"))
+
+# part of every ETag, so validators from before a server restart never match
+_etag_epoch = "{:x}".format(int(time.time()))
+
+# what the leaderboard viewers have been sent so far, new viewers start from the same "full" snapshot
+_leadboard_pushed: Dict[str, object] = {"version": -1, "data": None, "full": None}
+_leadboard_push_task = None
+
+tick_phase_seconds = metrics.Histogram("ah_tick_phase_seconds", "Time spent in each phase of a server tick.", ("phase",))
+tick_errors_total = metrics.Counter("ah_tick_errors_total", "Exceptions raised by a tick phase.", ("phase",))
+rounds_total = metrics.Counter("ah_rounds_total", "Rounds played since the server started.")
+bids_total = metrics.Counter("ah_bids_total", "Bids received, by result (accepted or the reason for rejecting them).", ("result",))
+pool_buys_total = metrics.Counter("ah_pool_buys_total", "Pool buys received.")
+broadcast_bytes = metrics.Histogram("ah_broadcast_bytes", "Size of the round payload sent to the agents.",
+                                    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7))
+connected_agents = metrics.Gauge("ah_connected_agents", "Agents currently connected (mux agents counted one by one).")
+agent_connections = metrics.Gauge("ah_agent_connections", "Open agent websockets.")
+agent_connections.set_function(lambda: len(connection_manager.active_connections))
+leadboard_viewers_gauge = metrics.Gauge("ah_leadboard_viewers", "Open /ws_leadboard connections.")
+leadboard_viewers_gauge.set_function(lambda: len(leadboard_viewers.active_connections))
+bid_latency_seconds = metrics.Histogram("ah_bid_latency_seconds", "Time from the round broadcast to an agent's bid.")
+missed_rounds_total = metrics.Counter("ah_missed_rounds_total", "Rounds an agent did not bid on before the tick.")
+spectators_gauge = metrics.Gauge("ah_spectators", "Open /ws_spectate connections.")
+spectators_gauge.set_function(lambda: len(spectators))
+spectator_dropped_total = metrics.Counter("ah_spectator_dropped_rounds_total", "Rounds dropped for spectators that fell behind.")
+
+
+def _invalidate_leadboard():
+    global _leadboard_version
+    _leadboard_version += 1
 
 
 def _reset_game_state():
     """Reset auction house and clear leaderboard rank tracking state."""
-    global _previous_ranks, _rank_signals, _last_rank_round
+    global _rank_signals, _round_states, _new_game_snapshot_task
     auction_house.reset()
-    _previous_ranks = {}
+    if state_store is not None:
+        # the new game's first snapshot, restore() starts from it; written off the event loop
+        _new_game_snapshot_task = asyncio.create_task(state_store.snapshot_async(auction_house))
+    latency_tracker.reset()
     _rank_signals = {}
-    _last_rank_round = -1
+    _round_states = {"round": None, "states": {}}
+    _invalidate_leadboard()
+
+
+def _get_leadboard_cache() -> Dict[str, object]:
+    global _leadboard_cache
+    if _leadboard_cache["version"] != _leadboard_version:
+        _leadboard_cache = {
+            "version": _leadboard_version,
+            "state": _compute_leadboard_state(),
+            "round": auction_house.round_counter,
+            "is_done": auction_house.is_done,
+        }
+    return _leadboard_cache
+
+
+def _get_leadboard_api_data() -> Dict[str, object]:
+    cache = _get_leadboard_cache()
+    if "api_data" not in cache:
+        state = cache["state"]
+        cache["api_data"] = {
+            "round": cache["round"],
+            "is_done": cache["is_done"],
+            "bank_state": {
+                "gold_income_per_round": state["gold_income"],
+                "bank_interest_per_round": state["interest_rate"],
+                "bank_limit_per_round": state["gold_limit"],
+            },
+            "gold_in_pool": state["gold_in_pool"],
+            "players": state["players"],
+            "max_gold": state["max_gold"],
+            "min_gold": state["min_gold"],
+            "gold_income_change": state["gold_income_change"],
+            "gold_limit_change": state["gold_limit_change"],
+            "interest_rate_change": state["interest_rate_change"],
+            "total_players": len(state["players"]),
+        }
+    return cache["api_data"]
+
+
+_LEADBOARD_SORT_KEYS = {
+    "points": None,  # the state is already sorted by points
+    "gold": lambda p: p["gold"],
+    "avg_gain_10": lambda p: p["avg_gain_10"],
+    "name": lambda p: p["name"].lower(),
+}
+
+
+def _get_leadboard_order(sort: str, name_filter: str) -> List[int]:
+    """Player indices in the requested order, sorted/filtered once per version and then reused by every page request."""
+    cache = _get_leadboard_cache()
+    orders = cache.setdefault("orders", {})
+
+    key = (sort, name_filter)
+    if key not in orders:
+        players = cache["state"]["players"]
+        if name_filter:
+            order = [i for i in _get_leadboard_order(sort, "") if name_filter in players[i]["name"].lower()]
+        elif _LEADBOARD_SORT_KEYS[sort] is None:
+            order = list(range(len(players)))
+        else:
+            sort_key = _LEADBOARD_SORT_KEYS[sort]
+            # descending, except names which read best A-Z
+            order = sorted(range(len(players)), key=lambda i: sort_key(players[i]), reverse=(sort != "name"))
+
+        # a handful of filters per round at most, don't let odd queries grow the cache without bound
+        if len(orders) >= 32:
+            orders.clear()
+        orders[key] = order
+    return orders[key]
+
+
+def _get_leadboard_page(offset: int, limit: int, sort: str, name_filter: str, descending: bool) -> bytes:
+    players = _get_leadboard_cache()["state"]["players"]
+    order = _get_leadboard_order(sort, name_filter)
+    total = len(order)
+
+    offset = max(0, offset)
+    limit = max(0, min(limit, 1000))
+    if descending:
+        page = [players[i] for i in order[offset:offset + limit]]
+    else:
+        start = max(0, total - offset - limit)
+        page = [players[i] for i in reversed(order[start:total - offset])] if offset < total else []
+
+    data = dict(_get_leadboard_api_data())
+    data["players"] = page
+    data["total_players"] = total
+    data["offset"] = offset
+    data["limit"] = limit
+    data["sort"] = sort
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _get_leadboard_api_json() -> bytes:
+    cache = _get_leadboard_cache()
+    if "api_json" not in cache:
+        cache["api_json"] = json.dumps(_get_leadboard_api_data(), separators=(",", ":")).encode("utf-8")
+    return cache["api_json"]
+
+
+def _leadboard_diff(prev: Dict[str, object], current: Dict[str, object]) -> Dict[str, object]:
+    """Only what changed since prev: top level fields, changed fields per player, removed players and the new order."""
+    fields = {key: value for key, value in current.items() if key != "players" and prev.get(key) != value}
+
+    prev_players = {p["id"]: p for p in prev["players"]}
+    players = {}
+    for p in current["players"]:
+        old = prev_players.get(p["id"])
+        if old is None:
+            players[p["id"]] = p
+            continue
+        changed = {key: value for key, value in p.items() if old.get(key) != value}
+        if changed:
+            players[p["id"]] = changed
+
+    order = [p["id"] for p in current["players"]]
+    current_ids = set(order)
+    diff = {
+        "type": "diff",
+        "fields": fields,
+        "players": players,
+        "removed": [a_id for a_id in prev_players if a_id not in current_ids],
+    }
+    if order != [p["id"] for p in prev["players"]]:
+        diff["order"] = order
+    return diff
+
+
+def _update_leadboard_push():
+    """Moves the viewers' snapshot to the current version, returns the diff text to send (None if nothing to send)."""
+    global _leadboard_pushed
+    cache = _get_leadboard_cache()
+    if cache["version"] == _leadboard_pushed["version"]:
+        return None
+
+    prev = _leadboard_pushed["data"]
+    data = _get_leadboard_api_data()
+    if len(data["players"]) > LEADBOARD_PUSH_MAX_PLAYERS:
+        data = dict(data, players=[], paged=True)
+        full = json.dumps({"type": "full", "data": data}, separators=(",", ":"))
+    else:
+        full = '{"type":"full","data":' + _get_leadboard_api_json().decode("utf-8") + "}"
+
+    _leadboard_pushed = {
+        "version": cache["version"],
+        "data": data,
+        "full": full,
+    }
+
+    if prev is None:
+        return None
+    return json.dumps(_leadboard_diff(prev, data), separators=(",", ":"))
+
+
+async def _push_leadboard(diff_text: str):
+    try:
+        await leadboard_viewers.broadcast_text(diff_text, timeout=0.5)
+    except Exception as e:
+        print("error in leaderboard push:", e)
+
+
+def _schedule_leadboard_push():
+    """Built once per change and fanned out to all viewers without blocking the tick."""
+    global _leadboard_push_task
+
+    # nobody to push to, the first viewer to connect builds the snapshot
+    if not leadboard_viewers.active_connections:
+        return
+
+    # a push still in flight: leave the snapshot alone so every viewer gets the diffs in order
+    if _leadboard_push_task is not None and not _leadboard_push_task.done():
+        return
+
+    diff_text = _update_leadboard_push()
+    if diff_text is not None:
+        _leadboard_push_task = asyncio.create_task(_push_leadboard(diff_text))
+
+
+def _update_rank_signals():
+    """Called once per settled round: age the rank arrows and add the round's movers from the rank index."""
+    global _rank_signals
+
+    updated_signals: Dict[str, Dict[str, int]] = {}
+    for a_id, sig in _rank_signals.items():
+        remaining = sig.get("remaining", 0)
+        move = sig.get("move", 0)
+        if remaining > 1 and move:
+            updated_signals[a_id] = {"move": move, "remaining": remaining - 1}
+
+    for a_id, move in auction_house.rank_movers.items():
+        if move > 0:
+            updated_signals[a_id] = {"move": 1, "remaining": 5}
+        else:
+            updated_signals[a_id] = {"move": -1, "remaining": 10}
+
+    _rank_signals = updated_signals
+
+
+def _publish_round():
+    """Everything a settled round changes for the viewers, for the live game and replays alike."""
+    _update_rank_signals()
+    _invalidate_leadboard()
+
+
+def _publish_spectators(text: str):
+    dropped = spectators.publish(text)
+    if dropped:
+        spectator_dropped_total.inc(dropped)
+
+
+def _replay_round(raw: bytes):
+    _publish_round()
+    _schedule_leadboard_push()
+    _publish_spectators(raw.decode("utf-8").rstrip("\n"))
 
 
 def _compute_leadboard_state():
-    global _previous_ranks, _rank_signals, _last_rank_round
+    # the states as the round was sent, the live ledger already holds the gold bid in the open round
+    # (a replayed house only holds sent rounds)
+    sent_states = _round_states["states"] if log_replay is None else {}
 
+    # already in leaderboard order, maintained by the rank index as rounds settle
     leadboard = []
-    for a_id, info in auction_house.agents.items():
+    for a_id in auction_house.rank_index.ids():
+        info = sent_states.get(a_id) or auction_house.agents[a_id]
         name = auction_house.names[a_id]
         leadboard.append(
             {
@@ -86,36 +396,8 @@ def _compute_leadboard_state():
     except IndexError:
         pass
 
-    leadboard.sort(key=lambda x: x["points"], reverse=True)
     n_players = max(len(leadboard), 1)
 
-    current_round = auction_house.round_counter
-
-    if current_round != _last_rank_round:
-        updated_signals: Dict[str, Dict[str, int]] = {}
-        for a_id, sig in _rank_signals.items():
-            remaining = sig.get("remaining", 0)
-            move = sig.get("move", 0)
-            if remaining > 1 and move:
-                updated_signals[a_id] = {"move": move, "remaining": remaining - 1}
-
-        _rank_signals = updated_signals
-
-        current_ranks: Dict[str, int] = {}
-        for idx, entry in enumerate(leadboard):
-            a_id = entry["id"]
-            rank_index = idx + 1
-            current_ranks[a_id] = rank_index
-            prev_rank = _previous_ranks.get(a_id)
-            if prev_rank is not None:
-                if rank_index < prev_rank:
-                    _rank_signals[a_id] = {"move": 1, "remaining": 5}
-                elif rank_index > prev_rank:
-                    _rank_signals[a_id] = {"move": -1, "remaining": 10}
-
-        _previous_ranks = current_ranks
-        _last_rank_round = current_round
-
     all_players = []
     for idx, entry in enumerate(leadboard):
         a_id = entry["id"]
@@ -139,9 +421,8 @@ def _compute_leadboard_state():
             else:
                 grade = "E"
 
-        history = auction_house.points_gain_history.get(a_id, [])
-        last_window = history[-10:]
-        avg_gain_10 = float(sum(last_window)) / len(last_window) if last_window else 0.0
+        last_window = auction_house.points_history.recent_gains(a_id, 10)
+        avg_gain_10 = float(last_window.mean()) if len(last_window) else 0.0
 
         sig = _rank_signals.get(a_id, {})
         move_val = sig.get("move", 0) if sig.get("remaining", 0) > 0 else 0
@@ -152,20 +433,17 @@ def _compute_leadboard_state():
         else:
             rank_move = "none"
 
-        # Build sparkline data from cumulative points history
-        sparkline = []
-        cumulative = 0
-        for gain in history[-20:]:
-            cumulative += gain
-            sparkline.append(cumulative)
-        # Normalize sparkline relative to first value so it shows trend
-        if sparkline:
-            base = sparkline[0] if sparkline[0] != 0 else 1
-            # Keep raw values for sparkline, JS will normalize
-        
+        # points over the last 20 rounds, JS normalizes so the offset does not matter
+        sparkline = auction_house.points_history.sparkline(a_id, 20).tolist()
+
+        # the flags are kept up by close_round, the page only shows the p99 of slow agents
+        slow = latency_tracker.is_slow(a_id)
+        p99_ms = latency_tracker.agent_stats(a_id)["p99_ms"] if slow else None
+
         all_players.append(
             {
                 "id": a_id,
+                "rank": idx + 1,
                 "grade": grade,
                 "name": name,
                 "gold": gold,
@@ -173,6 +451,9 @@ def _compute_leadboard_state():
                 "avg_gain_10": avg_gain_10,
                 "rank_move": rank_move,
                 "sparkline": sparkline,
+                "latency_p99_ms": p99_ms,
+                "missed_rounds": latency_tracker.total_missed.get(a_id, 0),
+                "slow": slow,
             }
         )
 
@@ -194,53 +475,211 @@ def _compute_leadboard_state():
         "min_gold": min_gold,
     }
 
+def _validate_agent_info(agent_info):
+    """Returns the cleaned agent info (name, a_id, player_id) or None if it is not acceptable."""
+    if not isinstance(agent_info, dict):
+        return None
+
+    a_id = agent_info.get("a_id", "")
+    name = agent_info.get("name", "")
+    player_id = agent_info.get("player_id", "")
+
+    if not isinstance(a_id, str) or not isinstance(name, str) or not isinstance(player_id, str):
+        return None
+
+    if len(a_id) < 5 or len(name) < 1 or len(name) > 64:
+        return None
+
+    if len(player_id) < 1:
+        return None
+
+    return {"a_id": a_id, "name": name, "player_id": player_id}
+
+
+def _register_bids_and_pool(a_id:str, bids_and_pool, round_answered=None):
+    """round_answered: the round the client says it bids on (None for clients that do not send it)."""
+    if round_answered is not None and round_answered != auction_house.round_counter - 1:
+        # a late answer to a round that is already settled, not a bid on the open one
+        bids_total.inc(result="stale_round")
+        return
+
+    latency = latency_tracker.bid_received(a_id, round_answered)
+    if latency is not None:
+        bid_latency_seconds.observe(latency)
+        tracer.instant("bid", cat="bids", a_id=a_id, latency_ms=round(latency * 1000, 3))
+
+    try:
+        if bids_and_pool is None or bids_and_pool == {}:
+            return
+
+        bids = bids_and_pool.get("bids", {})
+        pool = bids_and_pool.get("pool", 0)
+
+    except Exception as e:
+        print("error in receive_json:", e)
+        return
+
+    try:
+        if pool > 0:
+            auction_house.register_pool_buy(a_id, pool)
+            pool_buys_total.inc()
+
+        for auction_id, gold in bids.items():
+            try:
+                result = auction_house.register_bid(a_id, auction_id, gold)
+            except (TypeError, ValueError):
+                result = "invalid_amount"
+            bids_total.inc(result=result)
+
+    except Exception as e:
+        print("error in receive_json:", e)
+
+
+async def _play_round():
+    """Settles the round the agents just bid on and sends out the next one."""
+    tick_start = time.perf_counter()
+    missed = latency_tracker.close_round(connection_manager.connected_agent_ids())
+    if missed:
+        missed_rounds_total.inc(len(missed))
+
+    try:
+        with tick_phase_seconds.time(phase="process_pool_buys"), tracer.span("settle pool"):
+            auction_house.process_pool_buys()
+    except Exception as e:
+        tick_errors_total.inc(phase="process_pool_buys")
+        print("error in process_pool_buys:", e)
+
+    try:
+        with tick_phase_seconds.time(phase="process_all_bids"), tracer.span("settle bids"):
+            auction_house.process_all_bids()
+    except Exception as e:
+        tick_errors_total.inc(phase="process_all_bids")
+        print("error in process_all_bids:", e)
+
+    global _round_states
+    round_data = None
+    try:
+        with tick_phase_seconds.time(phase="prepare_auctions_and_pool"), tracer.span("prepare round"):
+            round_data = auction_house.prepare_auctions_and_pool()
+        _round_states = {"round": round_data["round"],
+                         "states": {a_id: dict(state) for a_id, state in round_data["states"].items()}}
+    except Exception as e:
+        tick_errors_total.inc(phase="prepare_auctions_and_pool")
+        print("error in prepare_auctions_and_pool:", e)
+
+    with tick_phase_seconds.time(phase="leadboard"), tracer.span("leaderboard"):
+        _publish_round()
+
+    if round_data is not None:
+        rounds_total.inc()
+        try:
+            latency_tracker.round_sent(round_data["round"], connection_manager.connected_agent_ids())
+            with tick_phase_seconds.time(phase="broadcast"), tracer.span("broadcast", connections=len(connection_manager.active_connections)):
+                if STATE_VIEW == "compact":
+                    # the shared part serialized once, each connection gets its own agents' states spliced in
+                    view = CompactView(round_data, auction_house.rank_index.ids(), VIEW_TOP_K)
+                    text = view.text_for()
+                    await connection_manager.broadcast_each(view.text_for, timeout=0.5)
+                else:
+                    # serialized once, the agents and the spectators get the same text
+                    text = json.dumps(round_data, separators=(",", ":"))
+                    await connection_manager.broadcast_text(text, timeout=0.5)
+            broadcast_bytes.observe(len(text))
+            _publish_spectators(text)
+        except Exception as e:
+            tick_errors_total.inc(phase="broadcast")
+            print("error in broadcast:", e)
+
+    if auction_house.round_counter >= auction_house.num_rounds_in_game:
+        auction_house.is_active = False
+        auction_house.is_done = True
+        _invalidate_leadboard()
+
+        try:
+            await connection_manager.disconnect_all()
+        except Exception as e:
+            print("error in disconnect_all:", e)
+
+    if state_store is not None:
+        try:
+            with tracer.span("snapshot"):
+                await state_store.round_settled(auction_house)
+        except Exception as e:
+            tick_errors_total.inc(phase="snapshot")
+            print("error in snapshot:", e)
+
+    tick_phase_seconds.observe(time.perf_counter() - tick_start, phase="total")
+
+
 async def server_tick():
+    bids_open_since = None
     while True:
+        tick_profiler.tick_started()
         if auction_house.is_active:
-            try:
-                auction_house.process_pool_buys()
-            except Exception as e:
-                print("error in process_pool_buys:", e)
+            # the time the agents had for the round that is settled now
+            if bids_open_since is not None:
+                tracer.complete("collect bids", bids_open_since, time.perf_counter(), round=auction_house.round_counter - 1)
 
-            try:
-                auction_house.process_all_bids()
-            except Exception as e:
-                print("error in process_all_bids:", e)
+            with tracer.span("round", round=auction_house.round_counter):
+                await _play_round()
+            bids_open_since = time.perf_counter() if auction_house.is_active else None
 
-            round_data = None
-            try:
-                round_data = auction_house.prepare_auctions_and_pool()
-            except Exception as e:
-                print("error in prepare_auctions_and_pool:", e)
+        # right after a round settles, also picks up joins and resets between rounds
+        try:
+            _schedule_leadboard_push()
+        except Exception as e:
+            print("error in leaderboard push:", e)
 
-            if round_data is not None:
-                try:
-                    await connection_manager.broadcast(round_data, timeout=0.5)
-                except Exception as e:
-                    print("error in broadcast:", e)
+        tick_profiler.tick_finished()
+        tracer.flush()
+        if state_store is not None:
+            state_store.flush()
+        await asyncio.sleep(TICK_INTERVAL)
 
-            if auction_house.round_counter >= auction_house.num_rounds_in_game:
-                auction_house.is_active = False
-                auction_house.is_done = True
 
-                try:
-                    await connection_manager.disconnect_all()
-                except Exception as e:
-                    print("error in disconnect_all:", e)
+async def run_local_agents(files: List[str]):
+    """Hosts agents inside the server process, connected through the in-process transport."""
+    from dnd_auction_game.host import AgentHost
 
-        await asyncio.sleep(1.0)
+    agent_host = AgentHost(token=auction_house.game_token, player_id="local_host", transport="local")
+    for path in files:
+        try:
+            agent_host.add_agent(path)
+        except Exception as e:
+            print("skipping local agent {}: {}".format(path, e))
 
+    print("hosting {} agents in the server process".format(len(agent_host.agents)))
+    await agent_host.run_async()
 
 
 @asynccontextmanager
 async def start_app_background_tasks(app: FastAPI):
-    task = asyncio.create_task(server_tick())
+    if state_store is not None:
+        # agents of a restored game get back in through the "reconnected" path of add_agent
+        if state_store.restore(auction_house) is None:
+            state_store.attach(auction_house)
+        _invalidate_leadboard()
+
+    tasks = [asyncio.create_task(server_tick())]
+
+    # AH_LOCAL_AGENTS=a.py,b.py hosts these agents in-process (no network between them and the game)
+    local_agents = [f for f in os.environ.get("AH_LOCAL_AGENTS", "").split(",") if f.strip()]
+    if local_agents:
+        tasks.append(asyncio.create_task(run_local_agents(local_agents)))
+
     yield
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
+    await _stop_replay()
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    tracer.close()
+    if state_store is not None:
+        state_store.close()
 
 
 app = FastAPI(lifespan=start_app_background_tasks)
@@ -250,7 +689,7 @@ app = FastAPI(lifespan=start_app_background_tasks)
 async def websocket_endpoint_client(websocket: WebSocket, token: str):
     
 
-    if token != auction_house.game_token:
+    if token != auction_house.game_token or log_replay is not None:
         return
 
     if auction_house.is_done:
@@ -260,24 +699,12 @@ async def websocket_endpoint_client(websocket: WebSocket, token: str):
 
     try:
         await websocket.accept()
-        agent_info = await websocket.receive_json()
-        
-        a_id = agent_info.get("a_id", "")
-        name = agent_info.get("name", "")
-        player_id = agent_info.get("player_id", "")
-        
-        if len(a_id) < 5 or len(name) < 1 or len(name) > 64:
-            await websocket.close()
-            return
-        
-        if len(player_id) < 1:
+        agent_info = _validate_agent_info(await websocket.receive_json())
+
+        if agent_info is None:
             await websocket.close()
             return
         
-        agent_info["a_id"] = a_id
-        agent_info["name"] = name
-        agent_info["player_id"] = player_id
-        
     except WebSocketDisconnect:
         return
     
@@ -294,50 +721,167 @@ async def websocket_endpoint_client(websocket: WebSocket, token: str):
         return
     
     try:        
-        await connection_manager.add_connection(websocket)
+        connected_agents.inc()
+        await connection_manager.add_connection(websocket, [agent_info["a_id"]])
         auction_house.add_agent(agent_info["name"], agent_info["a_id"], agent_info["player_id"])
+        _invalidate_leadboard()
         a_id = agent_info["a_id"]
         
         while auction_house.is_done is False:
-            binds = {}
-            pool = 0
-
             bids_and_pool = await websocket.receive_json()
-            try:
-                if bids_and_pool is None or bids_and_pool == {}:
-                    continue
-                
-                bids = bids_and_pool.get("bids", {})
-                pool = bids_and_pool.get("pool", 0)
-
-            except Exception as e:
-                print("error in receive_json:", e)
-                continue
-                        
-            try:
-                if pool > 0:
-                    auction_house.register_pool_buy(a_id, pool)
-
-                for auction_id, gold in bids.items():
-                    auction_house.register_bid(a_id, auction_id, gold)
-
-            except Exception as e:
-                print("error in receive_json:", e)
-                continue
+            round_answered = bids_and_pool.get("round") if isinstance(bids_and_pool, dict) else None
+            _register_bids_and_pool(a_id, bids_and_pool, round_answered)
 
         await websocket.close()
+        connected_agents.dec()
             
     except WebSocketDisconnect:        
         print("agent: {} disconnected.".format(agent_info["a_id"]))
         connection_manager.disconnect(websocket)
+        connected_agents.dec()
         return
     
     except:
         print("agent: {} was disconnected due to error.".format(agent_info["a_id"]))
         connection_manager.disconnect(websocket)
+        connected_agents.dec()
+        return
+
+
+@app.websocket("/ws_mux/{token}")
+async def websocket_endpoint_mux(websocket: WebSocket, token: str):
+    """Many agents over one connection: one shared round payload down, one combined bid message up.
+
+    register: {"agents": [{"name": .., "a_id": .., "player_id": ..}, ...]}
+    bids:     {"round": .., "agents": {a_id: {"bids": {..}, "pool": ..}, ...}}
+    """
+
+    if token != auction_house.game_token or log_replay is not None:
+        return
+
+    if auction_house.is_done:
+        with _reset_lock:
+            if auction_house.is_done:
+                _reset_game_state()
+
+    try:
+        await websocket.accept()
+        register_info = await websocket.receive_json()
+
+        agent_infos = []
+        for info in register_info.get("agents", []):
+            info = _validate_agent_info(info)
+            if info is None:
+                continue
+            # Block new players after the game has started; allow reconnections only
+            if auction_house.is_active and info["a_id"] not in auction_house.agents:
+                continue
+            agent_infos.append(info)
+
+        if not agent_infos:
+            await websocket.close()
+            return
+
+        # ack before joining the broadcast, so it is always the first message the client gets
+        await websocket.send_json({"registered": [info["a_id"] for info in agent_infos]})
+
+    except WebSocketDisconnect:
+        return
+
+    except Exception:
+        return
+
+    registered = set()
+    try:
+        await connection_manager.add_connection(websocket, [info["a_id"] for info in agent_infos])
+        for info in agent_infos:
+            auction_house.add_agent(info["name"], info["a_id"], info["player_id"])
+            registered.add(info["a_id"])
+            connected_agents.inc()
+        _invalidate_leadboard()
+
+        while auction_house.is_done is False:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                continue
+
+            for a_id, bids_and_pool in message.get("agents", {}).items():
+                if a_id in registered:
+                    _register_bids_and_pool(a_id, bids_and_pool, message.get("round"))
+
+        await websocket.close()
+        connected_agents.dec(len(registered))
+
+    except WebSocketDisconnect:
+        print("mux connection with {} agents disconnected.".format(len(registered)))
+        connection_manager.disconnect(websocket)
+        connected_agents.dec(len(registered))
+        return
+
+    except:
+        print("mux connection with {} agents was disconnected due to error.".format(len(registered)))
+        connection_manager.disconnect(websocket)
+        connected_agents.dec(len(registered))
         return
     
 
+register_local_endpoint("ws", websocket_endpoint_client)
+register_local_endpoint("ws_mux", websocket_endpoint_mux)
+
+
+@app.websocket("/ws_leadboard")
+async def websocket_endpoint_leadboard(websocket: WebSocket):
+    """Pushes the leaderboard: one full snapshot on connect, then one diff per change."""
+    try:
+        await websocket.accept()
+
+        # the snapshot is only kept up to date while someone watches
+        if not leadboard_viewers.active_connections:
+            _update_leadboard_push()
+
+        # resend if a push happened while the snapshot was on its way, the viewer must not miss a diff
+        while True:
+            version = _leadboard_pushed["version"]
+            await websocket.send_text(_leadboard_pushed["full"])
+            if version == _leadboard_pushed["version"]:
+                break
+        await leadboard_viewers.add_connection(websocket)
+
+        while True:
+            await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        leadboard_viewers.disconnect(websocket)
+
+    except:
+        leadboard_viewers.disconnect(websocket)
+
+
+async def _receive_until_closed(websocket: WebSocket):
+    while True:
+        await websocket.receive_text()
+
+
+@app.websocket("/ws_spectate")
+async def websocket_endpoint_spectator(websocket: WebSocket):
+    """The round payload the agents get, without joining the game."""
+    await websocket.accept()
+    queue = spectators.add(websocket)
+    sender = asyncio.create_task(spectators.pump(websocket, queue))
+    # nothing is read from spectators, receiving only notices the disconnect
+    receiver = asyncio.create_task(_receive_until_closed(websocket))
+    try:
+        # whichever ends first: the client went away or a send failed
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # a failed send or receive is how a spectator leaves, there is nothing to report
+            task.exception()
+    finally:
+        spectators.remove(websocket)
+        sender.cancel()
+        receiver.cancel()
+
+
 @app.websocket("/ws_run/{play_token}")
 async def websocket_endpoint_runner(websocket: WebSocket, play_token: str):
     
@@ -346,6 +890,10 @@ async def websocket_endpoint_runner(websocket: WebSocket, play_token: str):
     if play_token != auction_house.play_token:
         print("wrong play token")
         return
+
+    if log_replay is not None:
+        print("a replay is running, stop it first")
+        return
     
     if auction_house.is_done:
         print("starting new game")
@@ -358,10 +906,8 @@ async def websocket_endpoint_runner(websocket: WebSocket, play_token: str):
 
         game_info = await websocket.receive_json()
         num_rounds = max(1, int(game_info.get("num_rounds", 10)))
-        auction_house.num_rounds_in_game = num_rounds
-        auction_house.set_num_rounds(auction_house.num_rounds_in_game)
 
-        print("starting game with {} rounds".format(auction_house.num_rounds_in_game))
+        print("starting game with {} rounds".format(num_rounds))
 
         game_info = {
             "game_token": auction_house.game_token,
@@ -375,8 +921,10 @@ async def websocket_endpoint_runner(websocket: WebSocket, play_token: str):
         return
 
     
-    auction_house.assign_priorities()
-    auction_house.is_active = True
+    auction_house.start_game(num_rounds)
+    if state_store is not None:
+        await state_store.snapshot_async(auction_house)
+    _invalidate_leadboard()
     print("<started game>")
 
     try:
@@ -391,6 +939,8 @@ async def reset_server(play_token: str):
     if play_token != auction_house.play_token:
         return {"ok": False, "error": "wrong play token"}
 
+    await _stop_replay()
+
     # Disconnect any existing clients and reset state
     try:
         await connection_manager.disconnect_all()
@@ -401,44 +951,337 @@ async def reset_server(play_token: str):
     print("<server reset>")
     return {"ok": True}
 
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """br over gzip when the client accepts it (and brotli is installed), None for identity."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _leadboard_response(request: Request, key, media_type: str, build_body, store: str = "bodies") -> Response:
+    """Conditional, precompressed response for anything derived from the leaderboard state.
+
+    The ETag is the leaderboard version plus the content coding: the identity, gzip and br bodies of a
+    version are different representations. If-None-Match is compared with the tag of the variant this
+    request would get, a client holding the current version only costs a lookup of the bodies built for it.
+    Bodies and their gzip/brotli forms are built once per version and shared by every client.
+    """
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    # If-None-Match compares weakly
+    if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if_none_match = [tag[2:] if tag.startswith("W/") else tag for tag in if_none_match]
+
+    cache = _get_leadboard_cache()
+    bodies = cache.setdefault(store, {})
+    if key not in bodies:
+        if len(bodies) >= 64:
+            bodies.clear()
+        bodies[key] = {None: build_body()}
+    variants = bodies[key]
+
+    encoding = _accepted_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is not None and len(variants[None]) < 512:
+        encoding = None
+
+    headers["ETag"] = '"{}-{}{}"'.format(_etag_epoch, _leadboard_version, "-" + encoding if encoding is not None else "")
+    if headers["ETag"] in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None and encoding not in variants:
+        if encoding == "br":
+            variants[encoding] = brotli.compress(variants[None], quality=5)
+        else:
+            variants[encoding] = gzip.compress(variants[None], compresslevel=6)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=variants[encoding], media_type=media_type, headers=headers)
+
+
+def _render_leadboard_html() -> bytes:
+    cache = _get_leadboard_cache()
+    state = cache["state"]
+    # the page takes over from the first push, only the top of the board is rendered server side
+    return generate_leadboard(
+        state["players"][:100],
+        cache["round"],
+        cache["is_done"],
+        bank_state={
+            "gold_income_per_round": state["gold_income"],
+            "bank_interest_per_round": state["interest_rate"],
+            "bank_limit_per_round": state["gold_limit"],
+        },
+        gold_in_pool=state["gold_in_pool"],
+    ).encode("utf-8")
+
+
 @app.get("/")
-async def get():    
-    state = _compute_leadboard_state()
-
-    return HTMLResponse(
-        generate_leadboard(
-            state["players"],
-            auction_house.round_counter,
-            auction_house.is_done,
-            bank_state={
-                "gold_income_per_round": state["gold_income"],
-                "bank_interest_per_round": state["interest_rate"],
-                "bank_limit_per_round": state["gold_limit"],
-            },
-            gold_in_pool=state["gold_in_pool"],
-        )
-    )
+async def get(request: Request):
+    return _leadboard_response(request, "html", "text/html; charset=utf-8", _render_leadboard_html)
 
 
 @app.get("/api/leadboard")
-async def get_leadboard_data():
-    state = _compute_leadboard_state()
+async def get_leadboard_data(request: Request, offset: int = 0, limit: Optional[int] = None, sort: str = "points",
+                              order: str = "desc", name_filter: str = Query("", alias="filter")):
+    """The whole leaderboard, or one page of it with ?offset=&limit=&sort=points|gold|avg_gain_10|name&order=desc|asc&filter=<name>."""
+    if limit is None and offset == 0 and sort == "points" and order == "desc" and not name_filter:
+        return _leadboard_response(request, "api", "application/json", _get_leadboard_api_json)
+
+    if sort not in _LEADBOARD_SORT_KEYS:
+        return Response(content=json.dumps({"error": "unknown sort: {}".format(sort)}), status_code=400,
+                        media_type="application/json")
+
+    limit = 100 if limit is None else limit
+    name_filter = name_filter.lower()
+    descending = order != "asc"
+    return _leadboard_response(request, ("page", offset, limit, sort, name_filter, descending), "application/json",
+                               lambda: _get_leadboard_page(offset, limit, sort, name_filter, descending))
+
+
+_HISTORY_DOWNSAMPLE = {
+    "lttb": downsample_lttb,
+    "minmax": downsample_minmax,
+}
+
+_HISTORY_MAX_RESOLUTION = 5000
+
+
+def _get_agent_history(a_id: str, field: str, method: str, resolution: int) -> bytes:
+    rounds, values = auction_house.series.series(a_id, field)
+    x, y = _HISTORY_DOWNSAMPLE[method](rounds, values, resolution)
+    return json.dumps({
+        "id": a_id,
+        "field": field,
+        "method": method,
+        "num_rounds": len(rounds),
+        "rounds": x.tolist(),
+        "values": y.tolist(),
+    }, separators=(",", ":")).encode("utf-8")
+
+
+@app.get("/debug/profile/start/{play_token}")
+async def start_profile(play_token: str, mode: str = "cprofile", ticks: int = 10, interval: float = 0.005):
+    """Profiles the next ?ticks= server ticks, mode cprofile or sample (every ?interval= seconds)."""
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
 
+    try:
+        tick_profiler.start(mode=mode, ticks=ticks, interval=interval)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "status": tick_profiler.status()}
+
+
+@app.get("/debug/profile/stop/{play_token}")
+async def stop_profile(play_token: str):
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    tick_profiler.stop()
+    return {"ok": True, "status": tick_profiler.status()}
+
+
+@app.get("/debug/profile/result/{play_token}")
+async def get_profile_result(play_token: str, format: str = "text", sort: str = "cumulative", limit: int = 50):
+    """format: text (pstats, or collapsed stacks for mode sample), prof (cProfile file for snakeviz/pstats) or status."""
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    if format == "status" or tick_profiler.mode is None:
+        return {"ok": True, "status": tick_profiler.status()}
+
+    if format == "prof":
+        if tick_profiler.mode != "cprofile" or tick_profiler.active:
+            return {"ok": False, "error": "no finished cprofile session"}
+        return Response(content=tick_profiler.prof_bytes(), media_type="application/octet-stream",
+                        headers={"Content-Disposition": "attachment; filename=server_tick.prof"})
+
+    if tick_profiler.mode == "sample":
+        return PlainTextResponse(tick_profiler.collapsed())
+
+    if tick_profiler.active:
+        return {"ok": False, "error": "profiling in progress", "status": tick_profiler.status()}
+
+    try:
+        return PlainTextResponse(tick_profiler.pstats_text(sort=sort, limit=limit))
+    except KeyError:
+        return {"ok": False, "error": "unknown sort: {}".format(sort)}
+
+
+@app.get("/debug/tracemalloc/snapshot/{play_token}")
+async def tracemalloc_snapshot(play_token: str, limit: int = 30, frames: int = 1):
+    """Top allocations by line, and the diff against the previous snapshot (tracing starts with the first one)."""
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    result = memory_tracer.snapshot(limit=limit, frames=frames)
+    result["ok"] = True
+    return result
+
+
+@app.get("/debug/tracemalloc/stop/{play_token}")
+async def tracemalloc_stop(play_token: str):
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    memory_tracer.stop()
+    return {"ok": True}
+
+
+async def _stop_replay():
+    global auction_house, log_replay, _live_state, _rank_signals
+    if log_replay is None:
+        return
+
+    await log_replay.stop()
+    auction_house = _live_state["house"]
+    _rank_signals = _live_state["rank_signals"]
+    log_replay = None
+    _live_state = None
+    _invalidate_leadboard()
+    print("<replay stopped>")
+
+
+_LOG_NAME = re.compile(r"auction_house_log_\d+\.jsonln")
+
+
+@app.get("/replay/start/{play_token}")
+async def start_replay(play_token: str, log: Optional[str] = None, game: int = -1, round: int = 0, speed: float = 1.0):
+    """Plays a recorded game (?log=, default the server's own log) to the leaderboard viewers from ?round=.
+
+    ?speed=1 plays a round every AH_TICK_INTERVAL seconds, 10 ten times as fast, 0 as fast as possible.
+    """
+    global auction_house, log_replay, _live_state, _rank_signals
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    await _stop_replay()
+    if auction_house.is_active:
+        return {"ok": False, "error": "a game is running"}
+
+    path = auction_house.log_file
+    if log:
+        # only the server's own logs, by file name: no other path on the machine can be opened this way
+        log_dir = os.path.realpath(os.path.dirname(auction_house.log_file) or ".")
+        path = os.path.join(log_dir, log)
+        if (_LOG_NAME.fullmatch(log) is None
+                or os.path.dirname(os.path.realpath(path)) != log_dir):
+            return {"ok": False, "error": "not a log of this server: '{}'".format(log)}
+
+    if not path or not os.path.isfile(path):
+        return {"ok": False, "error": "no log file: '{}'".format(log or path)}
+
+    try:
+        replay = LogReplay(path, game_token=auction_house.game_token, play_token=auction_house.play_token, game=game,
+                           tick_interval=TICK_INTERVAL, on_round=_replay_round)
+        replay.seek(round)
+    except (ValueError, KeyError, OSError) as e:
+        return {"ok": False, "error": str(e)}
+
+    _live_state = {"house": auction_house, "rank_signals": _rank_signals}
+    auction_house = replay.house
+    _rank_signals = {}
+    log_replay = replay
+    _replay_round(replay.current_round())
+    replay.start(speed)
+    print("<replaying '{}'>".format(path))
+    return {"ok": True, "status": replay.status()}
+
+
+@app.get("/replay/seek/{play_token}")
+async def seek_replay(play_token: str, round: Optional[int] = None, speed: Optional[float] = None):
+    """Jumps to ?round= (the index finds it without reading the rounds before) and/or changes the ?speed=."""
+    global auction_house, _rank_signals
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    if log_replay is None:
+        return {"ok": False, "error": "no replay running"}
+
+    if round is not None:
+        # the playing task may be reading the next round, it is restarted from the new position
+        await log_replay.stop()
+        log_replay.seek(round)
+        auction_house = log_replay.house
+        _rank_signals = {}
+        _replay_round(log_replay.current_round())
+    if speed is not None:
+        log_replay.speed = max(0.0, speed)
+    # also resumes a replay that reached the end
+    log_replay.start(log_replay.speed)
+    return {"ok": True, "status": log_replay.status()}
+
+
+@app.get("/replay/stop/{play_token}")
+async def stop_replay(play_token: str):
+    """Ends the replay, the leaderboard shows the live game again."""
+    if play_token != auction_house.play_token:
+        return {"ok": False, "error": "wrong play token"}
+
+    await _stop_replay()
+    return {"ok": True}
+
+
+@app.get("/api/latency")
+async def get_latency():
+    """Per-agent broadcast-to-bid latency (p50/p99 over recent rounds, misses) and a tick interval that fits the p99."""
+    agents = {a_id: latency_tracker.agent_stats(a_id) for a_id in auction_house.agents}
+    for a_id, stats in agents.items():
+        stats["name"] = auction_house.names.get(a_id, "")
+
+    p50 = latency_tracker.percentile(50)
+    p99 = latency_tracker.percentile(99)
     return {
-        "round": auction_house.round_counter,
-        "is_done": auction_house.is_done,
-        "bank_state": {
-            "gold_income_per_round": state["gold_income"],
-            "bank_interest_per_round": state["interest_rate"],
-            "bank_limit_per_round": state["gold_limit"],
-        },
-        "gold_in_pool": state["gold_in_pool"],
-        "players": state["players"],
-        "max_gold": state["max_gold"],
-        "min_gold": state["min_gold"],
-        "gold_income_change": state["gold_income_change"],
-        "gold_limit_change": state["gold_limit_change"],
-        "interest_rate_change": state["interest_rate_change"],
+        "tick_interval": TICK_INTERVAL,
+        "p50_ms": None if p50 is None else round(p50 * 1000, 2),
+        "p99_ms": None if p99 is None else round(p99 * 1000, 2),
+        "recommended_tick": latency_tracker.recommended_tick(),
+        "slow_agents": sorted(a_id for a_id, stats in agents.items() if stats["slow"]),
+        "agents": agents,
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Tick phase timings, bid counters, payload sizes and connections in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/states")
+async def get_states(request: Request):
+    """Gold and points of every agent as the current round was sent, what the full state view sends."""
+    def build_body() -> bytes:
+        return json.dumps(_round_states, separators=(",", ":")).encode("utf-8")
+
+    return _leadboard_response(request, "states", "application/json", build_body, store="states")
+
+
+@app.get("/api/history/{a_id}")
+async def get_agent_history(request: Request, a_id: str, field: str = "points", resolution: int = 500,
+                            method: str = "lttb"):
+    """One agent's gold or points for the whole game, downsampled to at most ?resolution= points (lttb or minmax)."""
+    if a_id not in auction_house.series:
+        return Response(content=json.dumps({"error": "unknown agent: {}".format(a_id)}), status_code=404,
+                        media_type="application/json")
+
+    error = None
+    if field not in SERIES_FIELDS:
+        error = "unknown field: {}".format(field)
+    elif method not in _HISTORY_DOWNSAMPLE:
+        error = "unknown method: {}".format(method)
+    if error is not None:
+        return Response(content=json.dumps({"error": error}), status_code=400, media_type="application/json")
+
+    resolution = max(3, min(resolution, _HISTORY_MAX_RESOLUTION))
+    # kept apart from the leaderboard bodies, a chart per agent would otherwise evict them
+    return _leadboard_response(request, (a_id, field, method, resolution), "application/json",
+                               lambda: _get_agent_history(a_id, field, method, resolution), store="history")
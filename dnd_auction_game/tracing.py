@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer:"Tracer", name:str, cat:str, args:dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.complete(self.name, self.start, time.perf_counter(), cat=self.cat, **self.args)
+        return False
+
+
+class Tracer:
+    """Writes Chrome trace events (open the file in ui.perfetto.dev or chrome://tracing).
+
+    Disabled until open() is called, then span() / instant() cost a couple of attribute lookups.
+    Spans on the event loop thread nest by time, so the spans of one tick form a tree; work that
+    overlaps (one send per connection) is written as async events, one track per connection.
+    Events are buffered and written on flush(), the file is valid JSON once close() ran.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._fp = None
+        self._buffer = []
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+
+    def open(self, path:str):
+        self.close()
+        self._fp = open(path, "w")
+        self._fp.write("[\n")
+        self._t0 = time.perf_counter()
+        self._buffer = []
+        self.enabled = True
+        self._emit({"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": "dnd_auction_game server"}})
+        print("tracing to: '{}'".format(path))
+
+    def _ts(self, t:float) -> float:
+        return round((t - self._t0) * 1e6, 3)
+
+    def _emit(self, event:dict):
+        self._buffer.append(json.dumps(event, separators=(",", ":")))
+
+    def span(self, name:str, cat:str="round", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def complete(self, name:str, start:float, end:float, cat:str="round", **args):
+        """A span that already happened, start and end from time.perf_counter()."""
+        if not self.enabled:
+            return
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._ts(start), "dur": self._ts(end) - self._ts(start),
+                 "pid": self._pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        self._emit(event)
+
+    def instant(self, name:str, cat:str="round", **args):
+        if not self.enabled:
+            return
+        event = {"name": name, "cat": cat, "ph": "i", "s": "t", "ts": self._ts(time.perf_counter()),
+                 "pid": self._pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        self._emit(event)
+
+    def async_span(self, name:str, span_id:int, start:float, end:float, cat:str="send", **args):
+        """An overlapping span (e.g. one send of a broadcast), drawn on its own track."""
+        if not self.enabled:
+            return
+        begin = {"name": name, "cat": cat, "ph": "b", "id": span_id, "ts": self._ts(start), "pid": self._pid,
+                 "tid": threading.get_ident()}
+        if args:
+            begin["args"] = args
+        self._emit(begin)
+        self._emit({"name": name, "cat": cat, "ph": "e", "id": span_id, "ts": self._ts(end), "pid": self._pid,
+                    "tid": threading.get_ident()})
+
+    def flush(self):
+        if self._fp is None or not self._buffer:
+            return
+        self._fp.write("".join(line + ",\n" for line in self._buffer))
+        self._fp.flush()
+        self._buffer = []
+
+    def close(self):
+        if self._fp is None:
+            return
+        self.flush()
+        # a trailing event without a comma closes the array
+        self._fp.write(json.dumps({"name": "trace_end", "ph": "i", "s": "g", "ts": self._ts(time.perf_counter()),
+                                   "pid": self._pid, "tid": threading.get_ident()}) + "\n]\n")
+        self._fp.close()
+        self._fp = None
+        self.enabled = False
+
+
+tracer = Tracer()
+
+
+def configure(path:Optional[str]):
+    """Starts tracing to path (AH_TRACE_FILE), a falsy path leaves tracing off."""
+    if path:
+        tracer.open(path)
@@ -0,0 +1,60 @@
+import json
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+# "full": every agent gets the states of all agents, "compact": its own state, the top-K and aggregates
+STATE_VIEWS = ("full", "compact")
+
+_QUANTILES = (10, 25, 50, 75, 90)
+
+
+def aggregates(states:Dict[str, dict]) -> Dict[str, object]:
+    """Count, mean, quantiles and extremes of the gold and points of all agents."""
+    n = len(states)
+    out = {"count": n}
+    for field in ("gold", "points"):
+        if n == 0:
+            out[field] = None
+            continue
+        values = np.fromiter((state[field] for state in states.values()), dtype=np.float64, count=n)
+        q = np.percentile(values, _QUANTILES)
+        out[field] = {
+            "mean": round(float(values.mean()), 2),
+            "min": int(values.min()),
+            "max": int(values.max()),
+            "quantiles": {"p{}".format(p): round(float(v), 2) for p, v in zip(_QUANTILES, q)},
+        }
+    return out
+
+
+def _entry(a_id:str, state:dict) -> str:
+    return json.dumps(a_id) + ":" + json.dumps(state, separators=(",", ":"))
+
+
+class CompactView:
+    """One round in the compact view, serialized once and spliced per connection.
+
+    Everything but "states" is shared, "states" is the last key, so the text for a connection is the
+    shared prefix, the top-K entries (serialized once) and the entries of the connection's own agents.
+    """
+    def __init__(self, round_data:Dict[str, object], rank_ids:List[str], top_k:int):
+        states = round_data["states"]
+        top = [a_id for a_id in rank_ids[:max(0, top_k)] if a_id in states]
+
+        shared = {key: value for key, value in round_data.items() if key != "states"}
+        shared["state_view"] = "compact"
+        shared["top_k"] = top
+        shared["aggregates"] = aggregates(states)
+
+        text = json.dumps(shared, separators=(",", ":"))
+        self._prefix = text[:-1] + ',"states":{'
+        self._top_text = ",".join(_entry(a_id, states[a_id]) for a_id in top)
+        self._top = set(top)
+        self._states = states
+
+    def text_for(self, a_ids:Sequence[str]=()) -> str:
+        parts = [self._top_text] if self._top_text else []
+        parts.extend(_entry(a_id, self._states[a_id]) for a_id in a_ids if a_id not in self._top and a_id in self._states)
+        return self._prefix + ",".join(parts) + "}}"
@@ -5,6 +5,8 @@ import os
 import signal
 import glob
 
+from dnd_auction_game.host import has_make_bid
+
 # Configuration
 SERVER_CMD = ["uvicorn", "dnd_auction_game.server:app", "--port", "8000"]
 GAME_RUNNER_CMD = [sys.executable, "-m", "dnd_auction_game.play", "1000"] # Runs for 50 rounds
@@ -20,6 +22,8 @@ IGNORE_LIST = [
 
 def main():
     procs = []
+    # --in-process: agents exposing make_bid share one host process (their __main__ settings are not used)
+    in_process = "--in-process" in sys.argv[1:]
 
     print("--- 🚀 LAUNCHING DND AUCTION ARENA 🚀 ---")
 
@@ -37,6 +41,7 @@ def main():
     py_files = glob.glob("*.py")
     
     agent_count = 0
+    hosted = []
     for script in py_files:
         if script in IGNORE_LIST:
             continue
@@ -50,12 +55,22 @@ def main():
         except:
             continue
 
+        if in_process and has_make_bid(script):
+            hosted.append(script)
+            agent_count += 1
+            continue
+
         print(f"🔸 Launching Agent: {script}")
         # Run agent in background
         p = subprocess.Popen([sys.executable, script])
         procs.append(p)
         agent_count += 1
 
+    if hosted:
+        print(f"🔸 Hosting {len(hosted)} Agents in one process: {', '.join(hosted)}")
+        p = subprocess.Popen([sys.executable, "-m", "dnd_auction_game.host", *hosted])
+        procs.append(p)
+
     print(f"✅ {agent_count} Agents Online.")
     time.sleep(2)
 
@@ -26,6 +26,25 @@ def discover_agent_scripts() -> List[Path]:
     return sorted(scripts)
 
 
+def host_agents(num_agents: int, cpu_workers: int = 0) -> None:
+    from dnd_auction_game.host import AgentHost, has_make_bid
+
+    agents = [p for p in discover_agent_scripts() if has_make_bid(p)]
+    if not agents:
+        print("No agent_*.py scripts with make_bid found in", THIS_DIR)
+        return
+
+    print(f"\nHosting {num_agents} agents in this process...")
+    agent_host = AgentHost(cpu_workers=cpu_workers)
+    for _ in range(num_agents):
+        agent_host.add_agent(str(random.choice(agents)))
+
+    try:
+        agent_host.run()
+    except KeyboardInterrupt:
+        print("\nCtrl+C received, stopping agents...")
+
+
 def launch_agents(num_agents: int, extra_args: List[str] | None = None) -> None:
     if extra_args is None:
         extra_args = []
@@ -100,6 +119,17 @@ def main() -> None:
         default=4,
         help="Number of agents to start (default: 4)",
     )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Host all agents (scripts exposing make_bid) in this process instead of one process each",
+    )
+    parser.add_argument(
+        "--cpu-workers",
+        type=int,
+        default=0,
+        help="With --in-process: run strategies in this many worker processes",
+    )
     parser.add_argument(
         "extra",
         nargs=argparse.REMAINDER,
@@ -110,7 +140,10 @@ def main() -> None:
     num_agents = max(1, args.num)
     extra_args = args.extra or []
 
-    launch_agents(num_agents, extra_args)
+    if args.in_process:
+        host_agents(num_agents, args.cpu_workers)
+    else:
+        launch_agents(num_agents, extra_args)
 
 
 if __name__ == "__main__":
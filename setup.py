@@ -50,7 +50,8 @@ setup(
           'fastapi',
           'uvicorn',
           'websockets',
-          'Jinja2'
+          'Jinja2',
+          'numpy'
       ],
 )
 
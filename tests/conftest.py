@@ -0,0 +1,35 @@
+import io
+import os
+import contextlib
+
+import pytest
+
+from dnd_auction_game import server as server_module
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.latency import LatencyTracker
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The server module with a fresh house and leaderboard state, the house writes no logs."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="test", play_token="test", save_logs=False, seed=0)
+    house.log_player_id_file = os.devnull
+
+    monkeypatch.setattr(server_module, "auction_house", house)
+    monkeypatch.setattr(server_module, "latency_tracker", LatencyTracker())
+    monkeypatch.setattr(server_module, "_round_states", {"round": None, "states": {}})
+    monkeypatch.setattr(server_module, "_rank_signals", {})
+    monkeypatch.setattr(server_module, "_leadboard_cache", {"version": -1})
+    monkeypatch.setattr(server_module, "_leadboard_pushed", {"version": -1, "data": None, "full": None})
+    return server_module
+
+
+def play_round(house, bids):
+    """Settles the open round with bids {a_id: gold per auction} and opens the next one."""
+    for a_id, gold in bids.items():
+        for auction_id in house.current_auctions:
+            house.register_bid(a_id, auction_id, gold)
+    house.process_pool_buys()
+    house.process_all_bids()
+    return house.prepare_auctions_and_pool()
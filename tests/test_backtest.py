@@ -0,0 +1,83 @@
+import io
+import os
+import json
+import random
+import contextlib
+
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.backtest import backtest_rounds
+
+
+AGENT = "agent_0"
+
+
+def _record_game(seed:int, n_rounds:int=30, tie_bid:int=None):
+    """Plays a game of random bidders, returns AGENT's log (as the client writes it) and its bids per round.
+
+    Without tie_bid AGENT bids odd and the others even amounts, so AGENT is in no tie. With tie_bid
+    every agent bids tie_bid on every auction.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="test", play_token="test", save_logs=False, seed=seed)
+        house.log_player_id_file = os.devnull
+        for i in range(3):
+            house.add_agent("agent_{}".format(i), "agent_{}".format(i), "test")
+        house.start_game(n_rounds)
+
+        rng = random.Random(seed)
+        rounds, decisions = [], {}
+        while True:
+            house.process_pool_buys()
+            house.process_all_bids()
+            state = house.prepare_auctions_and_pool()
+            if house.round_counter >= house.num_rounds_in_game:
+                break
+
+            line = json.loads(json.dumps(state))
+            line["current_agent"] = AGENT
+            rounds.append(line)
+
+            for a_id, agent in house.agents.items():
+                bids = {}
+                for auction_id in house.current_auctions:
+                    if tie_bid is not None:
+                        bids[auction_id] = tie_bid
+                    elif rng.random() < 0.6:
+                        gold = rng.randint(1, max(1, agent["gold"] // 3))
+                        bids[auction_id] = gold | 1 if a_id == AGENT else gold & ~1
+                pool = rng.randint(1, agent["points"]) if agent["points"] > 0 and rng.random() < 0.1 else 0
+
+                if pool > 0:
+                    house.register_pool_buy(a_id, pool)
+                for auction_id, gold in bids.items():
+                    house.register_bid(a_id, auction_id, gold)
+                if a_id == AGENT:
+                    decisions[state["round"]] = {"bids": bids, "pool": pool}
+
+    return rounds, decisions
+
+
+def _replay(decisions):
+    def make_bid(agent_id, round, states, auctions, prev_auctions, pool, prev_pool_buys, bank_state):
+        return decisions[round]
+    return make_bid
+
+
+def test_recorded_bids_reproduce_the_recorded_game():
+    for seed in range(5):
+        rounds, decisions = _record_game(seed)
+        for ties in ("lose", "win", "random"):
+            result = backtest_rounds(iter(rounds), _replay(decisions), ties=ties, seed=seed)
+            assert result["rounds"] == len(rounds) - 1
+            assert (result["gold"], result["points"]) == (result["recorded_gold"], result["recorded_points"]), (seed, ties)
+
+
+def test_tie_policy_holds_for_every_tie_in_a_round():
+    rounds, decisions = _record_game(1, n_rounds=10, tie_bid=10)
+
+    lose = backtest_rounds(iter(rounds), _replay(decisions), ties="lose")
+    assert lose["auction_points"] == 0
+
+    win = backtest_rounds(iter(rounds), _replay(decisions), ties="win")
+    rewards = sum(info["reward"] for r in rounds[1:] for info in r["prev_auctions"].values())
+    assert win["auction_points"] == rewards
@@ -0,0 +1,51 @@
+from dnd_auction_game.latency import LatencyTracker
+
+
+def _round(tracker, r, answers, agents=("a", "b")):
+    """Sends round r at t=r, answers is {a_id: latency} of the agents that bid."""
+    tracker.round_sent(r, agents, t=r)
+    for a_id, latency in answers.items():
+        tracker.bid_received(a_id, r, t=r + latency)
+    return tracker.close_round(agents)
+
+
+def test_misses_are_not_samples():
+    tracker = LatencyTracker(window=10, slow_miss_rate=0.1)
+    for r in range(10):
+        answers = {"a": 0.01}
+        if r % 2 == 0:
+            answers["b"] = 0.02
+        assert _round(tracker, r, answers) == ([] if r % 2 == 0 else ["b"])
+
+    b = tracker.agent_stats("b")
+    assert b["samples"] == 5 and b["max_ms"] == 20.0
+    assert b["missed"] == 5 and b["miss_rate"] == 0.5 and b["slow"]
+    assert abs(tracker.percentile(100) - 0.02) < 1e-9
+    assert not tracker.is_slow("a") and tracker.is_slow("b")
+
+
+def test_slow_flags_follow_the_window():
+    tracker = LatencyTracker(window=10, slow_miss_rate=0.1)
+    _round(tracker, 0, {"a": 0.01})
+    _round(tracker, 1, {"a": 0.01})
+    assert tracker.slow == {"b"}
+
+    # the misses leave the window, b answers every round since
+    for r in range(2, 12):
+        _round(tracker, r, {"a": 0.01, "b": 0.01})
+    assert tracker.slow == set()
+    assert tracker.agent_stats("b")["missed"] == 2 and tracker.agent_stats("b")["miss_rate"] == 0.0
+
+
+def test_stats_are_kept_until_the_next_round_closes():
+    tracker = LatencyTracker()
+    _round(tracker, 0, {"a": 0.01, "b": 0.01})
+    stats = tracker.agent_stats("a")
+    stats["name"] = "changed"
+    assert "name" not in tracker.agent_stats("a")
+
+    tracker.round_sent(1, ("a", "b"), t=1)
+    tracker.bid_received("a", 1, t=1.5)
+    assert tracker.agent_stats("a")["max_ms"] == 10.0
+    tracker.close_round(("a", "b"))
+    assert tracker.agent_stats("a")["max_ms"] == 500.0
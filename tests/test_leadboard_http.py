@@ -0,0 +1,72 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+from conftest import play_round
+
+
+def _client(server, n=20):
+    house = server.auction_house
+    for i in range(n):
+        a_id = "agent_{}".format(i)
+        house.add_agent(a_id, a_id, "test")
+    house.start_game(10)
+    play_round(house, {})
+    server._invalidate_leadboard()
+    return TestClient(server.app)
+
+
+def _get(client, path="/api/leadboard", **headers):
+    """The response and its body as sent, the client would decode gzip itself."""
+    with client.stream("GET", path, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_each_encoding_has_its_own_etag(server):
+    client = _client(server)
+
+    plain, plain_body = _get(client, **{"accept-encoding": "identity"})
+    zipped, zipped_body = _get(client, **{"accept-encoding": "gzip"})
+    assert plain.status_code == zipped.status_code == 200
+    assert "content-encoding" not in plain.headers and zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert gzip.decompress(zipped_body) == plain_body
+
+    # a tag only validates the variant it was sent with
+    response, _ = _get(client, **{"accept-encoding": "gzip", "if-none-match": plain.headers["etag"]})
+    assert response.status_code == 200
+    response, _ = _get(client, **{"accept-encoding": "identity", "if-none-match": zipped.headers["etag"]})
+    assert response.status_code == 200
+
+    response, body = _get(client, **{"accept-encoding": "gzip", "if-none-match": zipped.headers["etag"]})
+    assert response.status_code == 304 and body == b""
+    assert response.headers["etag"] == zipped.headers["etag"]
+
+    # a list of tags, weak ones and * match as well
+    tags = 'W/"other", W/{}'.format(plain.headers["etag"])
+    assert _get(client, **{"accept-encoding": "identity", "if-none-match": tags})[0].status_code == 304
+    assert _get(client, **{"accept-encoding": "gzip", "if-none-match": "*"})[0].status_code == 304
+
+
+def test_a_new_round_changes_the_etag(server):
+    client = _client(server)
+    first, first_body = _get(client, **{"accept-encoding": "gzip"})
+
+    play_round(server.auction_house, {"agent_3": 100})
+    server._publish_round()
+
+    second, second_body = _get(client, **{"accept-encoding": "gzip", "if-none-match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert gzip.decompress(second_body) != gzip.decompress(first_body)
+
+
+def test_small_bodies_are_sent_as_they_are(server):
+    client = _client(server, n=0)
+    response, _ = _get(client, "/api/states", **{"accept-encoding": "gzip"})
+    assert response.status_code == 200 and "content-encoding" not in response.headers
+    assert not response.headers["etag"].endswith('-gzip"')
+
+    response, _ = _get(client, "/api/states", **{"accept-encoding": "gzip", "if-none-match": response.headers["etag"]})
+    assert response.status_code == 304
@@ -0,0 +1,65 @@
+import json
+
+from conftest import play_round
+
+
+def _setup(server, n=7):
+    house = server.auction_house
+    for i in range(n):
+        a_id = "agent_{}".format(i)
+        house.add_agent("Name{}".format(i % 3) + a_id, a_id, "test")
+    house.start_game(10)
+    play_round(house, {})
+    play_round(house, {"agent_{}".format(i): 20 * (i + 1) for i in range(n)})
+    server._publish_round()
+    return server._get_leadboard_cache()["state"]["players"]
+
+
+def _page(server, offset, limit, sort="points", name_filter="", descending=True):
+    return json.loads(server._get_leadboard_page(offset, limit, sort, name_filter, descending))
+
+
+def test_pages_cover_the_sorted_leaderboard(server):
+    players = _setup(server)
+    expected = {
+        "points": [p["id"] for p in players],
+        "gold": [p["id"] for p in sorted(players, key=lambda p: p["gold"], reverse=True)],
+        "name": [p["id"] for p in sorted(players, key=lambda p: p["name"].lower())],
+    }
+
+    for sort, ids in expected.items():
+        pages = [_page(server, offset, 3, sort) for offset in range(0, 9, 3)]
+        assert [p["id"] for page in pages for p in page["players"]] == ids
+        assert all(page["total_players"] == 7 and page["sort"] == sort for page in pages)
+
+        # ascending pages are read from the other end
+        asc = [p["id"] for offset in range(0, 9, 3) for p in _page(server, offset, 3, sort, descending=False)["players"]]
+        assert asc == ids[::-1]
+
+
+def test_filter_and_bounds(server):
+    players = _setup(server)
+
+    page = _page(server, 0, 100, name_filter="name1")
+    assert [p["id"] for p in page["players"]] == [p["id"] for p in players if p["name"].startswith("Name1")]
+    assert page["total_players"] == len(page["players"])
+
+    assert _page(server, 50, 10)["players"] == []
+    assert _page(server, 50, 10, descending=False)["players"] == []
+    page = _page(server, -5, 5000)
+    assert page["offset"] == 0 and page["limit"] == 1000 and len(page["players"]) == 7
+
+
+def test_orders_are_cached_per_version(server):
+    _setup(server)
+    order = server._get_leadboard_order("gold", "")
+    assert server._get_leadboard_order("gold", "") is order
+
+    play_round(server.auction_house, {"agent_0": 500})
+    server._publish_round()
+    assert server._get_leadboard_order("gold", "") is not order
+
+    # odd queries don't grow the cache without bound
+    for i in range(100):
+        server._get_leadboard_order("points", "x{}".format(i))
+    assert len(server._get_leadboard_cache()["orders"]) <= 32
@@ -0,0 +1,80 @@
+import json
+
+from dnd_auction_game.server import _leadboard_diff
+
+from conftest import play_round
+
+
+def _apply(current, diff):
+    """What the leaderboard page does with a diff."""
+    current = dict(current, **diff["fields"])
+    by_id = {p["id"]: dict(p) for p in current["players"]}
+    for a_id, update in diff["players"].items():
+        by_id.setdefault(a_id, {}).update(update)
+    for a_id in diff["removed"]:
+        by_id.pop(a_id, None)
+    order = diff.get("order", [p["id"] for p in current["players"]])
+    current["players"] = [by_id[a_id] for a_id in order if a_id in by_id]
+    return current
+
+
+def test_diff_holds_only_the_changes():
+    prev = {"round": 1, "gold_in_pool": 5, "players": [
+        {"id": "a", "points": 3, "gold": 10},
+        {"id": "b", "points": 1, "gold": 10},
+        {"id": "c", "points": 0, "gold": 10},
+    ]}
+    current = {"round": 2, "gold_in_pool": 5, "players": [
+        {"id": "b", "points": 4, "gold": 10},
+        {"id": "a", "points": 3, "gold": 10},
+        {"id": "d", "points": 0, "gold": 0},
+    ]}
+
+    diff = _leadboard_diff(prev, current)
+    assert diff["fields"] == {"round": 2}
+    assert diff["players"] == {"b": {"points": 4}, "d": {"id": "d", "points": 0, "gold": 0}}
+    assert diff["removed"] == ["c"]
+    assert diff["order"] == ["b", "a", "d"]
+    assert _apply(prev, diff) == current
+
+    # same order, no "order" key
+    assert "order" not in _leadboard_diff(current, current)
+
+
+def test_push_follows_the_leaderboard_version(server):
+    house = server.auction_house
+    for a_id in ("a", "b", "c"):
+        house.add_agent(a_id, a_id, "test")
+    house.start_game(10)
+    play_round(house, {})
+    server._invalidate_leadboard()
+
+    # the first build is the snapshot new viewers get, there is nothing to diff against yet
+    assert server._update_leadboard_push() is None
+    full = json.loads(server._leadboard_pushed["full"])
+    assert full["type"] == "full" and len(full["data"]["players"]) == 3
+    assert server._update_leadboard_push() is None
+
+    for bids in ({"a": 100, "b": 50}, {"c": 300}, {"b": 10}):
+        play_round(house, bids)
+        server._publish_round()
+
+        diff = json.loads(server._update_leadboard_push())
+        assert diff["type"] == "diff"
+        full["data"] = _apply(full["data"], diff)
+        assert full == json.loads(server._leadboard_pushed["full"])
+        # nothing changed since, nothing to push
+        assert server._update_leadboard_push() is None
+
+
+def test_large_leaderboards_push_the_header_only(server, monkeypatch):
+    monkeypatch.setattr(server, "LEADBOARD_PUSH_MAX_PLAYERS", 2)
+    house = server.auction_house
+    for a_id in ("a", "b", "c"):
+        house.add_agent(a_id, a_id, "test")
+    server._invalidate_leadboard()
+
+    server._update_leadboard_push()
+    full = json.loads(server._leadboard_pushed["full"])
+    assert full["data"]["paged"] is True
+    assert full["data"]["players"] == [] and full["data"]["total_players"] == 3
@@ -0,0 +1,87 @@
+import io
+import json
+import random
+import contextlib
+
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.log_replay import RoundIndex, LogReplay
+
+
+def _write_log(tmp_path, games=(15, 40)):
+    """Plays the games one after the other into one auction log, the way the server writes it."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="test", play_token="test", save_logs=True, seed=0)
+        house.log_file = str(tmp_path / "auction_house_log_1.jsonln")
+        house.log_player_id_file = str(tmp_path / "auction_house_log_player_id_1.jsonln")
+
+        rng = random.Random(0)
+        for g, n_rounds in enumerate(games):
+            if g > 0:
+                house.reset(seed=g)
+            for i in range(4):
+                house.add_agent("name_{}".format(i), "agent_{}".format(i), "test")
+            house.start_game(n_rounds)
+            while house.round_counter < house.num_rounds_in_game:
+                house.process_pool_buys()
+                house.process_all_bids()
+                house.prepare_auctions_and_pool()
+                for a_id, agent in house.agents.items():
+                    for auction_id in house.current_auctions:
+                        house.register_bid(a_id, auction_id, rng.randint(1, max(1, agent["gold"] // 4)))
+    return house.log_file
+
+
+def test_index_finds_every_game_and_round(tmp_path):
+    path = _write_log(tmp_path)
+    index = RoundIndex(path)
+
+    assert index.first_round == [0, 0]
+    assert [len(rounds) for rounds in index.games] == [15, 40]
+    assert list(index.rounds(1)) == list(range(40))
+    for game, r in ((0, 0), (0, 14), (1, 0), (1, 23), (1, 39)):
+        assert json.loads(index.read(game, r))["round"] == r
+
+    # a half written line is left for the next refresh
+    with open(path) as fp:
+        line = fp.readline()
+    with open(path, "a") as fp:
+        fp.write(line[:20])
+    index.refresh()
+    assert len(index.games) == 2
+    with open(path, "a") as fp:
+        fp.write(line[20:])
+    index.refresh()
+    assert len(index.games) == 3 and index.first_round[2] == 0
+
+
+def test_seek_rebuilds_the_state_of_the_round(tmp_path):
+    path = _write_log(tmp_path)
+    index = RoundIndex(path)
+
+    played = LogReplay(path, "test", "test")
+    played.seek(0)
+    for r in range(1, 40):
+        played._apply(json.loads(index.read(1, r)))
+        played.next_round += 1
+
+        sought = LogReplay(path, "test", "test")
+        assert sought.seek(r) == r
+        round_data = json.loads(index.read(1, r))
+        assert sought.house.agents == round_data["states"]
+        assert sought.house.round_counter == played.house.round_counter == r + 1
+        assert sought.house.rank_index.ids() == played.house.rank_index.ids()
+        assert sought.current_round() == index.read(1, r)
+        # enough rounds before it for the leaderboard's averages
+        for a_id in round_data["states"]:
+            assert list(sought.house.points_history.recent_gains(a_id, 10)) == list(played.house.points_history.recent_gains(a_id, 10))
+
+    assert played.house.names["agent_2"] == "name_2"
+    assert played.house.is_done
+
+
+def test_seek_stays_in_the_game(tmp_path):
+    path = _write_log(tmp_path)
+    replay = LogReplay(path, "test", "test", game=0)
+    assert replay.seek(-5) == 0
+    assert replay.seek(1000) == 14
+    assert replay.status()["round"] == 14 and replay.status()["games"] == 2
@@ -0,0 +1,72 @@
+import io
+import os
+import asyncio
+import random
+import contextlib
+
+from dnd_auction_game.auction_house import AuctionHouse
+from dnd_auction_game.persistence import StateStore
+
+
+def _new_house(log_file):
+    with contextlib.redirect_stdout(io.StringIO()):
+        house = AuctionHouse(game_token="test", play_token="test", save_logs=True, seed=0)
+    house.log_file = str(log_file)
+    house.log_player_id_file = os.devnull
+    return house
+
+
+async def _play(house, store, rounds, rng):
+    """Rounds the way server_tick plays them, random bids in between."""
+    for _ in range(rounds):
+        house.process_pool_buys()
+        house.process_all_bids()
+        house.prepare_auctions_and_pool()
+        await store.round_settled(house)
+
+        for a_id, agent in house.agents.items():
+            for auction_id in house.current_auctions:
+                if rng.random() < 0.5:
+                    house.register_bid(a_id, auction_id, rng.randint(1, max(1, agent["gold"] // 3)))
+            if agent["points"] > 0 and rng.random() < 0.1:
+                house.register_pool_buy(a_id, rng.randint(1, agent["points"]))
+
+
+def test_restore_from_snapshot_and_journal(tmp_path):
+    store = StateStore(str(tmp_path / "state"), snapshot_every=5)
+    house = _new_house(tmp_path / "log.jsonln")
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.attach(house)
+        for i in range(4):
+            house.add_agent("agent_{}".format(i), "agent_{}".format(i), "test")
+        house.start_game(50)
+        # 12 rounds: the last snapshot is at round 10, the rest comes from the journal
+        asyncio.run(_play(house, store, 12, random.Random(1)))
+    store.flush()
+
+    restored = _new_house(tmp_path / "log.jsonln")
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = StateStore(str(tmp_path / "state")).restore(restored)
+
+    assert result["seed"] == house.seed and result["mismatches"] == 0 and result["replayed"] > 0
+    assert restored.round_counter == house.round_counter == 12
+    assert restored.ledger_digest() == house.ledger_digest()
+    assert restored.current_auctions == house.current_auctions
+    assert dict(restored.current_bids) == dict(house.current_bids)
+    for a_id in house.agents:
+        assert list(restored.series.series(a_id, "points")[1]) == list(house.series.series(a_id, "points")[1])
+
+
+def test_reset_leaves_the_snapshot_to_the_caller(tmp_path):
+    store = StateStore(str(tmp_path), snapshot_every=5)
+    house = _new_house(tmp_path / "log.jsonln")
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.attach(house)
+        assert os.path.isfile(store.snapshot_path(house.seed))
+
+        house.reset(seed=7)
+    assert os.path.isfile(store.journal_path(7))
+    assert not os.path.isfile(store.snapshot_path(7))
+
+    asyncio.run(store.snapshot_async(house))
+    assert os.path.isfile(store.snapshot_path(7))
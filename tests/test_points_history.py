@@ -0,0 +1,55 @@
+import pickle
+
+from dnd_auction_game.history import PointsHistory
+
+
+def _play(history, agents, rounds, start=0):
+    for r in range(start, start + rounds):
+        for i, state in enumerate(agents.values()):
+            state["points"] += (r * (i + 1)) % 7
+            state["gold"] += r
+        history.record(agents)
+
+
+def test_points_history_windows():
+    history = PointsHistory(window=4, capacity=1)
+    agents = {"a": {"points": 0, "gold": 0}, "b": {"points": 0, "gold": 0}}
+    for a_id in agents:
+        history.add_agent(a_id)
+
+    gains = {"a": [], "b": []}
+    for r in range(6):
+        for a_id, g in (("a", r), ("b", 2 * r)):
+            agents[a_id]["points"] += g
+            gains[a_id].append(g)
+        history.record(agents)
+
+    assert list(history.recent_gains("a", 3)) == gains["a"][-3:]
+    # capped at the window
+    assert list(history.recent_gains("b", 10)) == gains["b"][-4:]
+    assert list(history.sparkline("a", 2)) == [10, 15]
+    assert len(history.recent_gains("unknown", 3)) == 0
+
+
+def test_points_history_pickle_round_trip():
+    history = PointsHistory(window=5, capacity=2)
+    agents = {a_id: {"points": 0, "gold": 0} for a_id in ("a", "b", "c")}
+    for a_id in agents:
+        history.add_agent(a_id)
+    _play(history, agents, 7)
+
+    restored = pickle.loads(pickle.dumps(history))
+    for a_id in agents:
+        assert list(restored.recent_gains(a_id, 5)) == list(history.recent_gains(a_id, 5))
+        assert list(restored.sparkline(a_id, 5)) == list(history.sparkline(a_id, 5))
+
+    # both keep recording (and growing) the same after the load
+    agents["d"] = {"points": 3, "gold": 0}
+    for h in (history, restored):
+        h.add_agent("d", 3)
+    copy = {a_id: dict(state) for a_id, state in agents.items()}
+    _play(history, agents, 3, start=7)
+    _play(restored, copy, 3, start=7)
+    for a_id in agents:
+        assert list(restored.recent_gains(a_id, 5)) == list(history.recent_gains(a_id, 5))
+        assert list(restored.sparkline(a_id, 5)) == list(history.sparkline(a_id, 5))
@@ -0,0 +1,83 @@
+import random
+
+from dnd_auction_game.rank_index import RankIndex
+
+
+def _full_sort(points, join_order):
+    return sorted(points, key=lambda a_id: (-points[a_id], join_order.index(a_id)))
+
+
+def test_order_and_ranks():
+    index = RankIndex()
+    for a_id, p in (("a", 5), ("b", 9), ("c", 5), ("d", 0)):
+        index.add(a_id, p)
+
+    assert index.ids() == ["b", "a", "c", "d"]
+    assert index.top(2) == ["b", "a"]
+    assert [index.rank_of(a_id) for a_id in "abcd"] == [2, 1, 3, 4]
+    assert len(index) == 4 and "c" in index and "e" not in index
+
+
+def test_new_agents_are_not_movers():
+    index = RankIndex()
+    index.add("a", 0)
+    assert index.settle() == {}
+
+    # b joins above a: a moved down, b has no earlier rank to move from
+    index.add("b", 10)
+    assert index.settle() == {"a": -1}
+    assert index.ids() == ["b", "a"]
+
+
+def test_settle_reports_movers_once():
+    index = RankIndex()
+    for a_id in "abcd":
+        index.add(a_id, 0)
+    index.settle()
+
+    index.update("c", 10)
+    assert index.settle() == {"c": 1, "a": -1, "b": -1}
+    assert index.settle() == {}
+
+    # ties are broken by join order: d joins c at 10 behind it, a gains but drops below d
+    index.update("d", 10)
+    index.update("a", 3)
+    assert index.ids() == ["c", "d", "a", "b"]
+    assert index.settle() == {"d": 1, "a": -1, "b": -1}
+
+
+def test_update_to_same_points_is_a_no_op():
+    index = RankIndex()
+    index.add("a", 4)
+    index.add("b", 4)
+    index.settle()
+
+    index.update("b", 4)
+    assert index.settle() == {}
+    assert index.ids() == ["a", "b"]
+
+
+def test_matches_a_full_sort():
+    rng = random.Random(3)
+    index = RankIndex()
+    points, join_order, ranks = {}, [], {}
+
+    for _ in range(200):
+        for _ in range(rng.randint(0, 3)):
+            a_id = "agent_{}".format(len(join_order))
+            join_order.append(a_id)
+            points[a_id] = rng.randint(0, 20)
+            index.add(a_id, points[a_id])
+        for a_id in rng.sample(join_order, min(len(join_order), 5)):
+            points[a_id] += rng.randint(0, 15)
+            index.update(a_id, points[a_id])
+
+        movers = index.settle()
+        order = _full_sort(points, join_order)
+        assert index.ids() == order
+
+        new_ranks = {a_id: rank for rank, a_id in enumerate(order, 1)}
+        expected = {a_id: 1 if new_ranks[a_id] < ranks[a_id] else -1
+                    for a_id in ranks if new_ranks[a_id] != ranks[a_id]}
+        assert movers == expected
+        ranks = new_ranks
@@ -0,0 +1,51 @@
+import json
+
+from dnd_auction_game.replay import record_game, replay_game
+
+
+def _tamper(path, round_number):
+    """Doubles the first bid placed in the given round (the round the tick after it settles)."""
+    with open(path) as fp:
+        entries = [json.loads(line) for line in fp]
+
+    r = 0
+    for entry in entries:
+        if entry["t"] == "tick":
+            r = entry["round"]
+        elif entry["t"] == "bid" and r == round_number:
+            entry["gold"] *= 2
+            break
+
+    with open(path, "w") as fp:
+        fp.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def test_recorded_games_replay_without_mismatches(tmp_path):
+    for seed in range(3):
+        result = replay_game(record_game(str(tmp_path), seed, n_agents=5, n_rounds=30))
+        assert result["error"] is None
+        assert result["rounds"] == 30 and result["mismatches"] == 0
+
+
+def test_a_tampered_round_is_detected(tmp_path):
+    path = record_game(str(tmp_path), 4, n_agents=5, n_rounds=30)
+    _tamper(path, 10)
+
+    result = replay_game(path)
+    assert result["error"] is None
+    assert result["mismatches"] > 0
+    # the bid is settled by the next tick
+    assert result["first_mismatch"] == 11
+
+
+def test_a_tampered_digest_is_detected(tmp_path):
+    path = record_game(str(tmp_path), 5, n_agents=5, n_rounds=30)
+    with open(path) as fp:
+        entries = [json.loads(line) for line in fp]
+    tick = [entry for entry in entries if entry["t"] == "tick"][20]
+    tick["digest"] = tick["digest"][::-1]
+    with open(path, "w") as fp:
+        fp.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    result = replay_game(path)
+    assert result["mismatches"] == 1 and result["first_mismatch"] == tick["round"]
@@ -0,0 +1,65 @@
+import pickle
+
+import numpy as np
+
+from dnd_auction_game.history import SeriesStore, downsample_lttb, downsample_minmax
+
+
+def _play(history, agents, rounds, start=0):
+    for r in range(start, start + rounds):
+        for i, state in enumerate(agents.values()):
+            state["points"] += (r * (i + 1)) % 7
+            state["gold"] += r
+        history.record(agents)
+
+
+def test_series_store_pickle_round_trip():
+    store = SeriesStore(agent_capacity=1, round_capacity=2)
+    agents = {"a": {"points": 0, "gold": 100}}
+    store.add_agent("a")
+    _play(store, agents, 3)
+    agents["b"] = {"points": 0, "gold": 50}
+    store.add_agent("b")
+    _play(store, agents, 2, start=3)
+
+    restored = pickle.loads(pickle.dumps(store))
+    for a_id in agents:
+        for field in ("points", "gold"):
+            rounds, values = store.series(a_id, field)
+            r_rounds, r_values = restored.series(a_id, field)
+            assert list(r_rounds) == list(rounds) and list(r_values) == list(values)
+    assert list(restored.series("b", "points")[0]) == [3, 4]
+
+    restored.record(agents)
+    assert restored.length == 6 and restored.series("a", "gold")[1][-1] == agents["a"]["gold"]
+
+
+def test_lttb_keeps_the_ends_and_the_spike():
+    x = np.arange(1000)
+    y = np.zeros(1000, dtype=np.int64)
+    y[500] = 100
+
+    dx, dy = downsample_lttb(x, y, 50)
+    assert len(dx) == 50
+    assert dx[0] == 0 and dx[-1] == 999
+    assert 500 in dx
+    assert np.all(np.diff(dx) > 0)
+
+    # short series are returned as they are
+    sx, sy = downsample_lttb(x[:10], y[:10], 50)
+    assert len(sx) == 10
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(0)
+    x = np.arange(1003)
+    y = rng.integers(-50, 50, size=1003)
+
+    dx, dy = downsample_minmax(x, y, 100)
+    assert len(dx) <= 100
+    assert np.all(np.diff(dx) > 0)
+    assert list(dy) == list(y[dx])
+    assert y.min() in dy and y.max() in dy
+
+    sx, _ = downsample_minmax(x[:50], y[:50], 100)
+    assert len(sx) == 50
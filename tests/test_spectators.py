@@ -0,0 +1,67 @@
+import time
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from dnd_auction_game.connection_manager import SpectatorChannel
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_a_spectator_that_falls_behind_loses_the_oldest_rounds():
+    channel = SpectatorChannel(queue_size=2)
+    channel.publish("r0")
+
+    async def run():
+        fast, slow = _FakeSocket(), _FakeSocket()
+        fast_queue = channel.add(fast)
+        slow_queue = channel.add(slow)
+        pump = asyncio.create_task(channel.pump(fast, fast_queue))
+
+        dropped = []
+        for r in range(1, 6):
+            dropped.append(channel.publish("r{}".format(r)))
+            await asyncio.sleep(0)
+        pump.cancel()
+
+        # the fast spectator keeps up, the slow one only holds the newest rounds
+        assert fast.sent == ["r{}".format(r) for r in range(6)]
+        assert [slow_queue.get_nowait() for _ in range(slow_queue.qsize())] == ["r4", "r5"]
+        assert dropped == [0, 1, 1, 1, 1]
+
+        channel.remove(slow)
+        assert channel.publish("r6") == 0 and len(channel) == 1
+
+    asyncio.run(run())
+
+
+def test_a_new_spectator_starts_from_the_current_round():
+    channel = SpectatorChannel(queue_size=0)
+    assert channel.queue_size == 1
+    assert channel.add(_FakeSocket()).empty()
+
+    channel.publish("r0")
+    queue = channel.add(_FakeSocket())
+    assert queue.get_nowait() == "r0"
+
+
+def test_endpoint_removes_a_spectator_that_disconnects(server, monkeypatch):
+    monkeypatch.setattr(server, "spectators", SpectatorChannel(queue_size=2))
+    server.spectators.publish('{"round":3}')
+
+    client = TestClient(server.app)
+    with client.websocket_connect("/ws_spectate") as websocket:
+        assert websocket.receive_text() == '{"round":3}'
+        assert len(server.spectators) == 1
+
+    for _ in range(100):
+        if len(server.spectators) == 0:
+            break
+        time.sleep(0.01)
+    assert len(server.spectators) == 0
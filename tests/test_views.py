@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+
+from dnd_auction_game.views import CompactView, aggregates
+
+
+def _round_data(n=6):
+    states = {"agent_{}".format(i): {"gold": 100 * i, "points": (7 * i) % 5} for i in range(n)}
+    return {"round": 3, "states": states, "auctions": {"a1": {"die": 6, "num": 2, "bonus": 1}}, "pool": 12}
+
+
+def test_compact_text_is_the_round_with_the_agents_states():
+    round_data = _round_data()
+    rank_ids = sorted(round_data["states"], key=lambda a_id: -round_data["states"][a_id]["points"])
+    view = CompactView(round_data, rank_ids, top_k=2)
+
+    for own in ([], ["agent_5"], ["agent_0", "agent_3"], [rank_ids[0]], ["unknown"]):
+        data = json.loads(view.text_for(own))
+        ids = rank_ids[:2] + [a_id for a_id in own if a_id not in rank_ids[:2] and a_id in round_data["states"]]
+
+        assert data["states"] == {a_id: round_data["states"][a_id] for a_id in ids}
+        assert list(data["states"]) == ids
+        assert data["top_k"] == rank_ids[:2]
+        assert data["state_view"] == "compact"
+        assert data["aggregates"] == aggregates(round_data["states"])
+        for key in ("round", "auctions", "pool"):
+            assert data[key] == round_data[key]
+
+
+def test_compact_text_without_leaders():
+    round_data = _round_data()
+    view = CompactView(round_data, list(round_data["states"]), top_k=0)
+    assert json.loads(view.text_for())["states"] == {}
+    assert json.loads(view.text_for(["agent_1"]))["states"] == {"agent_1": round_data["states"]["agent_1"]}
+
+    # leaders that are not in the round's states are skipped
+    view = CompactView(round_data, ["gone", "agent_2"], top_k=2)
+    assert json.loads(view.text_for())["top_k"] == ["agent_2"]
+
+
+def test_aggregates():
+    states = _round_data(11)["states"]
+    out = aggregates(states)
+    gold = np.array([s["gold"] for s in states.values()], dtype=np.float64)
+
+    assert out["count"] == 11
+    assert out["gold"]["min"] == 0 and out["gold"]["max"] == 1000 and out["gold"]["mean"] == 500.0
+    assert out["gold"]["quantiles"] == {"p{}".format(q): round(float(np.percentile(gold, q)), 2) for q in (10, 25, 50, 75, 90)}
+    assert out["points"]["max"] == 4
+
+    assert aggregates({}) == {"count": 0, "gold": None, "points": None}